@@ -1,7 +1,9 @@
 from aiogram import Bot, Dispatcher, Router
 import logging
 from config.config import Config
-from aiogram.fsm.storage.redis import RedisStorage
+from aiogram.fsm.storage.base import BaseStorage
+from bot.storage import BufferedRedisStorage
+from middlewares.fsm_session_middleware import FSMSessionMiddleware
 
 # from config.config import load_config
 from handlers.handlers import register_handlers
@@ -11,8 +13,14 @@ logger = logging.getLogger(__name__)
 # config = load_config()
 
 
-def create_dispatcher(storage: RedisStorage, bot: Bot) -> Dispatcher:
-    dp = Dispatcher(storage=storage)
+def create_dispatcher(storage: BaseStorage, bot: Bot) -> Dispatcher:
+    if isinstance(storage, BufferedRedisStorage):
+        # FSMContextMiddleware регистрируем сами, после сессии FSM
+        dp = Dispatcher(storage=storage, disable_fsm=True)
+        dp.update.outer_middleware(FSMSessionMiddleware(storage=storage))
+        dp.update.outer_middleware(dp.fsm)
+    else:
+        dp = Dispatcher(storage=storage)
     message_router = Router()
     register_handlers(message_router=message_router, bot=bot)
     dp.include_router(message_router)
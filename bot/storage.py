@@ -0,0 +1,230 @@
+import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Mapping
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+from redis.asyncio import Redis
+from redis.exceptions import WatchError
+
+logger = logging.getLogger(__name__)
+
+# сколько раз повторяем запись при конфликте с параллельным апдейтом
+FLUSH_ATTEMPTS = 3
+
+
+@dataclass(slots=True)
+class _Entry:
+    # сырые значения из Redis на момент загрузки - по ним ловим конфликты
+    raw_state: bytes | None
+    raw_data: bytes | None
+    state: str | None
+    data: dict[str, Any]
+    state_dirty: bool = False
+    data_replaced: bool = False
+    data_patch: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def dirty(self) -> bool:
+        return self.state_dirty or self.data_replaced or bool(self.data_patch)
+
+
+@dataclass
+class StorageStats:
+    sessions: int = 0
+    loads: int = 0
+    flushes: int = 0
+    conflicts: int = 0
+    failed: int = 0
+    round_trips: int = 0
+    # сколько запросов сделал бы RedisStorage на те же вызовы
+    direct_round_trips: int = 0
+
+
+_session: ContextVar[dict[StorageKey, _Entry] | None] = ContextVar(
+    "fsm_session", default=None
+)
+
+
+# обёртка над RedisStorage: внутри session() состояние и данные каждого ключа
+# читаются одним запросом, записи копятся в памяти и уходят одной транзакцией
+# MULTI/EXEC в конце апдейта; если ключ успели изменить (WATCH), патч
+# update_data накладывается на свежие данные и запись повторяется
+class BufferedRedisStorage(BaseStorage):
+    def __init__(self, storage: RedisStorage) -> None:
+        self.storage = storage
+        self.stats = StorageStats()
+
+    @property
+    def redis(self) -> Redis:
+        return self.storage.redis
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[None]:
+        if _session.get() is not None:
+            yield
+            return
+        entries: dict[StorageKey, _Entry] = {}
+        token = _session.set(entries)
+        self.stats.sessions += 1
+        try:
+            yield
+        finally:
+            _session.reset(token)
+            await self._flush(entries)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        self.stats.direct_round_trips += 1
+        entries = _session.get()
+        if entries is None:
+            self.stats.round_trips += 1
+            await self.storage.set_state(key, state)
+            return
+        entry = await self._entry(entries, key)
+        entry.state = state.state if isinstance(state, State) else state
+        entry.state_dirty = True
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        self.stats.direct_round_trips += 1
+        entries = _session.get()
+        if entries is None:
+            self.stats.round_trips += 1
+            return await self.storage.get_state(key)
+        return (await self._entry(entries, key)).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise TypeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+        self.stats.direct_round_trips += 1
+        entries = _session.get()
+        if entries is None:
+            self.stats.round_trips += 1
+            await self.storage.set_data(key, data)
+            return
+        entry = await self._entry(entries, key)
+        entry.data = data.copy()
+        entry.data_replaced = True
+        entry.data_patch.clear()
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        self.stats.direct_round_trips += 1
+        entries = _session.get()
+        if entries is None:
+            self.stats.round_trips += 1
+            return await self.storage.get_data(key)
+        return (await self._entry(entries, key)).data.copy()
+
+    async def update_data(
+        self, key: StorageKey, data: Mapping[str, Any]
+    ) -> dict[str, Any]:
+        entries = _session.get()
+        if entries is None:
+            return await super().update_data(key, data)
+        self.stats.direct_round_trips += 2
+        entry = await self._entry(entries, key)
+        entry.data.update(data)
+        if not entry.data_replaced:
+            entry.data_patch.update(data)
+        return entry.data.copy()
+
+    async def close(self) -> None:
+        await self.storage.close()
+
+    def metrics(self) -> dict[str, int]:
+        stats = self.stats
+        return {
+            "sessions": stats.sessions,
+            "loads": stats.loads,
+            "flushes": stats.flushes,
+            "conflicts": stats.conflicts,
+            "failed": stats.failed,
+            "round_trips": stats.round_trips,
+            "round_trips_saved": stats.direct_round_trips - stats.round_trips,
+        }
+
+    def _keys(self, key: StorageKey) -> tuple[str, str]:
+        key_builder = self.storage.key_builder
+        return key_builder.build(key, "state"), key_builder.build(key, "data")
+
+    def _decode_data(self, raw: bytes | str | None) -> dict[str, Any]:
+        if raw is None:
+            return {}
+        if isinstance(raw, bytes):
+            raw = raw.decode("utf-8")
+        return self.storage.json_loads(raw)
+
+    async def _entry(
+        self, entries: dict[StorageKey, _Entry], key: StorageKey
+    ) -> _Entry:
+        entry = entries.get(key)
+        if entry is not None:
+            return entry
+        raw_state, raw_data = await self.redis.mget(*self._keys(key))
+        self.stats.loads += 1
+        self.stats.round_trips += 1
+        state = raw_state.decode("utf-8") if isinstance(raw_state, bytes) else raw_state
+        entry = _Entry(
+            raw_state=raw_state,
+            raw_data=raw_data,
+            state=state,
+            data=self._decode_data(raw_data),
+        )
+        entries[key] = entry
+        return entry
+
+    async def _flush(self, entries: dict[StorageKey, _Entry]) -> None:
+        for key, entry in entries.items():
+            if not entry.dirty:
+                continue
+            try:
+                await self._flush_entry(key, entry)
+            except Exception as e:
+                self.stats.failed += 1
+                logger.exception("Failed to flush FSM state for %s: %s", key, e)
+
+    async def _flush_entry(self, key: StorageKey, entry: _Entry) -> None:
+        storage = self.storage
+        state_key, data_key = self._keys(key)
+        for _ in range(FLUSH_ATTEMPTS):
+            async with self.redis.pipeline(transaction=True) as pipe:
+                try:
+                    await pipe.watch(state_key, data_key)
+                    current = await pipe.mget(state_key, data_key)
+                    self.stats.round_trips += 2
+                    if current != [entry.raw_state, entry.raw_data]:
+                        # ключ изменил параллельный апдейт: состояние
+                        # перезаписываем, а изменения данных накладываем сверху
+                        self.stats.conflicts += 1
+                        entry.raw_state, entry.raw_data = current
+                        if not entry.data_replaced:
+                            entry.data = self._decode_data(current[1])
+                            entry.data.update(entry.data_patch)
+
+                    pipe.multi()
+                    if entry.state_dirty:
+                        if entry.state is None:
+                            pipe.delete(state_key)
+                        else:
+                            pipe.set(state_key, entry.state, ex=storage.state_ttl)
+                    if entry.data_replaced or entry.data_patch:
+                        if entry.data:
+                            pipe.set(
+                                data_key,
+                                storage.json_dumps(entry.data),
+                                ex=storage.data_ttl,
+                            )
+                        else:
+                            pipe.delete(data_key)
+                    await pipe.execute()
+                    self.stats.round_trips += 1
+                    self.stats.flushes += 1
+                    return
+                except WatchError:
+                    self.stats.round_trips += 1
+                    self.stats.conflicts += 1
+        raise WatchError(f"FSM key {data_key} kept changing during flush")
@@ -42,12 +42,75 @@ class RedisSettings:
     username: str
 
 
+@dataclass
+class ReminderSettings:
+    poll_interval: float
+    lookahead: int
+    lease: int
+    max_lateness: int
+    batch_size: int
+    fire_window: float
+    fire_batch: int
+    partitions: int
+    node_lease: float
+
+
+@dataclass
+class WebhookSettings:
+    use_queue: bool
+    workers: int
+    queue_size: int
+    drain_timeout: float
+
+
+@dataclass
+class ActivitySettings:
+    flush_interval: float
+    max_keys: int
+
+
+@dataclass
+class CacheSettings:
+    user_maxsize: int
+    user_ttl: float
+    todo_maxsize: int
+    todo_ttl: float
+    use_redis: bool
+
+
+@dataclass
+class SenderSettings:
+    global_rate: float
+    chat_rate: float
+    chat_burst: int
+    concurrency: int
+    queue_size: int
+    max_retries: int
+    drain_timeout: float
+
+
+@dataclass
+class OutboxSettings:
+    poll_interval: float
+    batch_size: int
+    lease: int
+    max_attempts: int
+    backoff_base: float
+    backoff_max: float
+
+
 @dataclass
 class Config:
     bot: BotSet
     db: DatabaseSettings
     redis: RedisSettings
     log: LoggerSet
+    reminders: ReminderSettings
+    webhook: WebhookSettings
+    activity: ActivitySettings
+    cache: CacheSettings
+    sender: SenderSettings
+    outbox: OutboxSettings
 
 
 @dataclass
@@ -87,6 +150,60 @@ def load_config(path: str | None = None) -> Config:
 
     logg_settings = LoggerSet(level=env("LOG_LEVEL"), format=env("LOG_FORMAT"))
 
+    reminders = ReminderSettings(
+        poll_interval=env.float("REMINDER_POLL_INTERVAL", default=5.0),
+        lookahead=env.int("REMINDER_LOOKAHEAD", default=60),
+        lease=env.int("REMINDER_LEASE", default=120),
+        max_lateness=env.int("REMINDER_MAX_LATENESS", default=3600),
+        batch_size=env.int("REMINDER_BATCH_SIZE", default=500),
+        fire_window=env.float("REMINDER_FIRE_WINDOW", default=10.0),
+        fire_batch=env.int("REMINDER_FIRE_BATCH", default=100),
+        partitions=env.int("REMINDER_PARTITIONS", default=16),
+        node_lease=env.float("REMINDER_NODE_LEASE", default=15.0),
+    )
+
+    webhook = WebhookSettings(
+        use_queue=env.bool("WEBHOOK_USE_QUEUE", default=True),
+        workers=env.int("WEBHOOK_WORKERS", default=8),
+        queue_size=env.int("WEBHOOK_QUEUE_SIZE", default=1000),
+        drain_timeout=env.float("WEBHOOK_DRAIN_TIMEOUT", default=10.0),
+    )
+
+    activity = ActivitySettings(
+        flush_interval=env.float("ACTIVITY_FLUSH_INTERVAL", default=10.0),
+        max_keys=env.int("ACTIVITY_MAX_KEYS", default=5000),
+    )
+
+    cache = CacheSettings(
+        user_maxsize=env.int("USER_CACHE_SIZE", default=10000),
+        user_ttl=env.float("USER_CACHE_TTL", default=300.0),
+        todo_maxsize=env.int("TODO_CACHE_SIZE", default=10000),
+        todo_ttl=env.float("TODO_CACHE_TTL", default=60.0),
+        use_redis=env.bool("USER_CACHE_REDIS", default=False),
+    )
+
+    # лимиты Telegram: ~30 сообщений в секунду на бота, ~1 в секунду в чат.
+    # SENDER_GLOBAL_RATE - лимит на всего бота: при нескольких воркерах
+    # каждый получает долю по числу живых узлов (см. PartitionMembership)
+    sender = SenderSettings(
+        global_rate=env.float("SENDER_GLOBAL_RATE", default=30.0),
+        chat_rate=env.float("SENDER_CHAT_RATE", default=1.0),
+        chat_burst=env.int("SENDER_CHAT_BURST", default=1),
+        concurrency=env.int("SENDER_CONCURRENCY", default=16),
+        queue_size=env.int("SENDER_QUEUE_SIZE", default=50000),
+        max_retries=env.int("SENDER_MAX_RETRIES", default=3),
+        drain_timeout=env.float("SENDER_DRAIN_TIMEOUT", default=10.0),
+    )
+
+    outbox = OutboxSettings(
+        poll_interval=env.float("OUTBOX_POLL_INTERVAL", default=5.0),
+        batch_size=env.int("OUTBOX_BATCH_SIZE", default=100),
+        lease=env.int("OUTBOX_LEASE", default=120),
+        max_attempts=env.int("OUTBOX_MAX_ATTEMPTS", default=8),
+        backoff_base=env.float("OUTBOX_BACKOFF_BASE", default=5.0),
+        backoff_max=env.float("OUTBOX_BACKOFF_MAX", default=900.0),
+    )
+
     logger.info("Configuration loaded successfully")
 
     return Config(
@@ -94,4 +211,10 @@ def load_config(path: str | None = None) -> Config:
         db=db,
         redis=redis,
         log=logg_settings,
+        reminders=reminders,
+        webhook=webhook,
+        activity=activity,
+        cache=cache,
+        sender=sender,
+        outbox=outbox,
     )
@@ -1,16 +1,14 @@
 from aiogram import Router, F, Bot
 from locales.cmd import commands_en, commands_ru
-import asyncio
 import logging
-from sql.todo_actions import add_todo
 from aiogram.filters import Command, CommandStart, StateFilter
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import default_state, State, StatesGroup
 from aiogram.filters import CommandObject
 from keyboard.keyboard import (
     keyboard_markup,
-    create_kb_month,
+    month_keyboard,
     DateFactory,
     region_kb_builder,
     regions,
@@ -18,82 +16,53 @@ from keyboard.keyboard import (
     build_activity_kb,
     TodoFactory,
     TodoDeleteFactory,
+    TodoSelectFactory,
     PageButton,
+    render_todo_row,
+    patch_todo_keyboard,
+    patch_page_counter,
+    confirm_keyboard,
+    decode_id,
 )
+from dataclasses import replace
 from datetime import datetime, timezone
-from zoneinfo import ZoneInfo, available_timezones
 from config.config import load_config, Config
 from psycopg.connection_async import AsyncConnection
-from sql.actions import get_user, add_user, change_user_alive_status
+from sql.user_cache import user_cache
+from sql.todo_cache import todo_page_cache
+from timezones.timezones import get_timezone_index, get_zone
 from sql.roles import UserRole
 from sql.todo_actions import (
-    get_todo_list,
-    get_all_todos,
-    change_todo_status,
-    remove_todo,
-    get_total_pages,
+    Todo,
+    TodoCursor,
+    TodoPage,
 )
+from psycopg_pool import AsyncConnectionPool
 from aiogram.fsm.storage.redis import RedisStorage
 from redis.asyncio import Redis
 from logging import basicConfig
 from config.config import Config, load_config
 from aiogram.enums import ParseMode
 from sql.actions import get_statistics
-
-
-async def schedule_reminder(bot, chat_id, todo, reminder_datetime):
-    try:
-        await asyncio.sleep(
-            (reminder_datetime - datetime.now(timezone.utc)).total_seconds()
-        )
-        await bot.send_message(chat_id, f"🔔 Reminder: {todo}")
-    except asyncio.CancelledError:
-        logger.info(f"Reminder cancelled for {chat_id}: {todo}")
-        raise
-
-
-scheduled_tasks: dict[tuple[int, str], asyncio.Task] = {}
-
-
-async def restore_tasks(
-    bot: Bot,
-    conn: AsyncConnection,
-):
-    todos = await get_all_todos(conn)
-    if todos:
-        mapped_todos = [
-            {
-                "user_id": user_id,
-                "todo": todo,
-                "reminder_time": reminder_time.isoformat() if reminder_time else None,
-                "done": done,
-                "timezone": timezone if timezone else "Europe/Moscow",
-            }
-            for user_id, todo, reminder_time, done, timezone in todos
-        ]
-    else:
-        logger.info("no reminders now")
-    for todo in mapped_todos:
-        user_id = todo["user_id"]
-        reminder_time = todo["reminder_time"]
-        todo = todo["todo"]
-        if datetime.fromisoformat(reminder_time) < datetime.now().astimezone(
-            timezone.utc
-        ):
-            logger.info(f"{todo} expired")
-            continue
-        else:
-            task = asyncio.create_task(
-                schedule_reminder(
-                    bot=bot,
-                    chat_id=user_id,
-                    todo=todo,
-                    reminder_datetime=datetime.fromisoformat(reminder_time),
-                )
-            )
-
-        logger.info(f"task :{todo} created")
-        scheduled_tasks[(user_id, todo)] = task
+from scheduler.scheduler import ScheduledReminder, reminder_scheduler
+from sender.outbox import DeliveryWorker
+from sql.delivery_actions import enqueue_reminder_delivery
+from middlewares.db_middlewares import release_connection
+
+
+async def send_reminder(
+    outbox: DeliveryWorker, db_pool: AsyncConnectionPool, reminder: ScheduledReminder
+) -> None:
+    # напоминание не отправляется здесь, а записывается в outbox вместе с
+    # отметкой о доставке; отправку и повторы ведёт DeliveryWorker
+    async with db_pool.connection() as conn:
+        delivery_id = await enqueue_reminder_delivery(
+            conn, todo_id=reminder.key, text=f"🔔 Reminder: {reminder.todo}"
+        )
+    if delivery_id is None:
+        logger.info(f"Reminder {reminder.key} already delivered or done")
+        return
+    outbox.wake()
 
 
 config: Config = load_config()
@@ -106,7 +75,6 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 regions = [region.lower() for region in regions]
-defaut_timezone = "Europe/Moscow"
 
 
 class DatePicker(StatesGroup):
@@ -117,24 +85,133 @@ class DatePicker(StatesGroup):
     pick_country = State()
 
 
-def available_timezone(region: str, city: str):
-    tz_list = available_timezones()
-    if f"{region}/{city}" in tz_list:
-        return True
-    else:
-        return False
+def is_city_name(text: str | None) -> bool:
+    return bool(text) and text.replace(" ", "").replace("_", "").replace(
+        "/", ""
+    ).replace("-", "").isalpha()
+
+
+def dump_cursor(cursor: TodoCursor | None) -> list | None:
+    return [cursor[0].isoformat(), cursor[1]] if cursor else None
+
+
+def load_cursor(value: list | None) -> TodoCursor | None:
+    return (datetime.fromisoformat(value[0]), value[1]) if value else None
+
+
+def page_state(todo_page: TodoPage) -> dict:
+    # в FSM храним только курсор начала страницы, сами напоминания
+    # берутся из todo_page_cache
+    return {"page_start": dump_cursor(todo_page.first)}
+
+
+async def refresh_todo_page(
+    conn: AsyncConnection, *, user_id: int, data: dict
+) -> tuple[int, TodoPage]:
+    page = data.get("page") or 1
+    page_start = load_cursor(data.get("page_start"))
+    todo_page = await todo_page_cache.get_page(conn, user_id=user_id, start=page_start)
+    if not todo_page.rows and page > 1:
+        # последняя страница опустела - показываем предыдущую
+        page -= 1
+        todo_page = await todo_page_cache.get_page(
+            conn, user_id=user_id, before=page_start
+        )
+    return page, todo_page
+
+
+def patch_todos(
+    markup: InlineKeyboardMarkup | None,
+    *,
+    todos: list[Todo],
+    todo_ids: list[int],
+    show_all: bool,
+    done: bool | None,
+) -> tuple[InlineKeyboardMarkup, list[Todo]] | None:
+    # точечно обновляет строки изменённых напоминаний (done=None - удаление);
+    # None - клавиатуру нужно перерисовать целиком
+    if markup is None or not todo_ids:
+        return None
+    changed = set(todo_ids)
+    patched_todos = []
+    for item in todos:
+        if item.id not in changed:
+            patched_todos.append(item)
+            continue
+        changed.discard(item.id)
+        row = None
+        if done is not None:
+            item = replace(item, done=done)
+            patched_todos.append(item)
+            if show_all or not done:
+                row = render_todo_row(
+                    todo_id=item.id,
+                    todo=item.todo,
+                    done=done,
+                    reminder_time=item.reminder_time,
+                    user_timezone=item.timezone,
+                )
+        markup = patch_todo_keyboard(markup, item.id, row)
+        if markup is None:
+            return None
+    if changed:
+        return None
+    return markup, patched_todos
 
 
 def register_handlers(message_router: Router, bot: Bot):
-    async def schedule_reminder(bot, chat_id, todo, reminder_datetime):
-        try:
-            await asyncio.sleep(
-                (reminder_datetime - datetime.now(timezone.utc)).total_seconds()
-            )
-            await bot.send_message(chat_id, f"🔔 Reminder: {todo}")
-        except asyncio.CancelledError:
-            logger.info(f"Reminder cancelled for {chat_id}: {todo}")
-            raise
+    async def redraw_todo_page(
+        callback: CallbackQuery,
+        *,
+        conn: AsyncConnection,
+        state: FSMContext,
+        data: dict,
+        text: str,
+    ):
+        user_id = callback.from_user.id
+        page, todo_page = await refresh_todo_page(conn, user_id=user_id, data=data)
+        await release_connection(conn)
+        todos = todo_page.rows
+        if not todos:
+            await callback.message.edit_text(text=commands_ru["no_todos"])
+        total_pages = todo_page.total_pages
+        await state.update_data(page=page, **page_state(todo_page))
+        await callback.message.edit_text(
+            text=text,
+            reply_markup=build_todo_keyboard(
+                todos=todos,
+                show_all=data.get("all"),
+                user_id=user_id,
+                conn=conn,
+                page=page,
+                total_pages=total_pages,
+                bulk=data.get("bulk", False),
+                selected=data.get("selected") or (),
+            ).as_markup(),
+        )
+
+    async def finish_bulk(
+        callback: CallbackQuery,
+        *,
+        conn: AsyncConnection,
+        state: FSMContext,
+        data: dict,
+        todo_ids: list[int],
+        text: str,
+    ):
+        await release_connection(conn)
+        # отмена всех затронутых напоминаний одним проходом планировщика
+        cancelled = reminder_scheduler.cancel_many(todo_ids)
+        logger.info(f"{len(todo_ids)} todos changed, {cancelled} reminders cancelled")
+        await state.update_data(bulk=False, selected=[])
+        await callback.answer(f"Изменено напоминаний: {len(todo_ids)}")
+        await redraw_todo_page(
+            callback,
+            conn=conn,
+            state=state,
+            data={**data, "bulk": False, "selected": []},
+            text=text,
+        )
 
     @message_router.message(CommandStart(), StateFilter(default_state))
     async def command_start(
@@ -142,9 +219,9 @@ def register_handlers(message_router: Router, bot: Bot):
     ):
         page = 1
         await state.update_data(page=page)
-        user_row = await get_user(conn, user_id=message.from_user.id)
+        user_row = await user_cache.get_user(conn, user_id=message.from_user.id)
         if user_row is None:
-            await add_user(
+            await user_cache.add_user(
                 conn,
                 user_id=message.from_user.id,
                 username=message.from_user.username,
@@ -152,9 +229,10 @@ def register_handlers(message_router: Router, bot: Bot):
                 role=UserRole.USER,
             )
         else:
-            await change_user_alive_status(
+            await user_cache.change_user_alive_status(
                 conn, is_alive=True, user_id=message.from_user.id
             )
+        await release_connection(conn)
 
         await message.answer(
             text=commands_ru["start"], parse_mode=ParseMode.MARKDOWN_V2
@@ -169,6 +247,7 @@ def register_handlers(message_router: Router, bot: Bot):
     @message_router.message(Command(commands="activity"))
     async def show_activity(message: Message, conn: AsyncConnection):
         stats = await get_statistics(conn=conn, user_id=message.from_user.id)
+        await release_connection(conn)
         builder = build_activity_kb(stats=stats)
         await message.answer(
             text=commands_ru["activity"],
@@ -178,50 +257,40 @@ def register_handlers(message_router: Router, bot: Bot):
 
     @message_router.message(Command(commands="list"), StateFilter(default_state))
     async def check_todos(message: Message, state: FSMContext, conn: AsyncConnection):
-        # total_pages = await get_total_pages(conn=conn, user_id=message.from_user.id)
         data = await state.get_data()
-        present_page = data.get("page")
-        if present_page:
-            page = present_page
-        else:
+        page = data.get("page") or 1
+        todo_page = await todo_page_cache.get_page(
+            conn,
+            user_id=message.from_user.id,
+            start=load_cursor(data.get("page_start")),
+        )
+        if not todo_page.rows and page > 1:
             page = 1
-        todos = await get_todo_list(conn=conn, user_id=message.from_user.id, page=page)
-        total_pages = await get_total_pages(conn=conn, user_id=message.from_user.id)
-        await state.update_data(total_pages=total_pages)
+            todo_page = await todo_page_cache.get_page(
+                conn, user_id=message.from_user.id
+            )
+        await release_connection(conn)
 
         all = True
 
-        await state.update_data(all=all)
-        if todos:
-            mapped_todos = [
-                {
-                    "todo": todo,
-                    "reminder_time": reminder_time.isoformat()
-                    if reminder_time
-                    else None,
-                    "done": done,
-                    "timezone": timezone,
-                }
-                for todo, reminder_time, done, timezone in todos
-            ]
-
-            await state.update_data(todos=mapped_todos)
-            data = await state.get_data()
-            page = data.get("page")
-            total_pages = data.get("total_pages")
+        if todo_page.rows:
+            await state.update_data(
+                page=page, all=all, bulk=False, selected=[], **page_state(todo_page)
+            )
             await message.answer(
                 text="Все активные напоминания:",
                 reply_markup=build_todo_keyboard(
-                    todos=mapped_todos,
+                    todos=todo_page.rows,
                     show_all=True,
                     user_id=message.from_user.id,
                     conn=conn,
                     page=page,
-                    total_pages=total_pages,
+                    total_pages=todo_page.total_pages,
                 ).as_markup(),
             )
 
         else:
+            await state.update_data(all=all)
             await message.answer(text=commands_ru["no_todos"])
 
     @message_router.callback_query(PageButton.filter())
@@ -234,72 +303,53 @@ def register_handlers(message_router: Router, bot: Bot):
         user_id = callback.from_user.id
         data = await state.get_data()
         page = data.get("page", 1)
-        total_pages = data.get("total_pages")
-        if total_pages == 1:
+        page_start = load_cursor(data.get("page_start"))
+        current = await todo_page_cache.get_page(
+            conn, user_id=user_id, start=page_start
+        )
+        if current.total_pages == 1:
             logger.info("total pages == 1")
             await callback.answer()
         if callback_data.page_up == 1:
-            if page + 1 <= total_pages:
-                todos = await get_todo_list(conn=conn, user_id=user_id, page=page + 1)
-                if todos:
-                    mapped_todos = [
-                        {
-                            "todo": todo,
-                            "reminder_time": reminder_time.isoformat()
-                            if reminder_time
-                            else None,
-                            "done": done,
-                            "timezone": timezone,
-                        }
-                        for todo, reminder_time, done, timezone in todos
-                    ]
-                    all = data.get("all")
-                    await callback.message.edit_text(
-                        text=f"page:{page + 1} reminder:",
-                        reply_markup=build_todo_keyboard(
-                            todos=mapped_todos,
-                            show_all=all,
-                            user_id=user_id,
-                            conn=conn,
-                            page=page + 1,
-                            total_pages=total_pages,
-                        ).as_markup(),
-                    )
-                    await state.update_data(page=page + 1)
+            if current.has_next and current.rows:
+                todo_page = await todo_page_cache.get_page(
+                    conn, user_id=user_id, after=current.last
+                )
+                page += 1
             else:
                 logger.info("on final page")
                 await callback.answer()
+                return
         elif callback_data.page_down == 1:
             if page - 1 >= 1:
-                todos = await get_todo_list(conn=conn, user_id=user_id, page=page - 1)
-                if todos:
-                    mapped_todos = [
-                        {
-                            "todo": todo,
-                            "reminder_time": reminder_time.isoformat()
-                            if reminder_time
-                            else None,
-                            "done": done,
-                            "timezone": timezone,
-                        }
-                        for todo, reminder_time, done, timezone in todos
-                    ]
-                    all = data.get("all")
-                    await callback.message.edit_text(
-                        text=f"page:{page - 1} reminder:",
-                        reply_markup=build_todo_keyboard(
-                            todos=mapped_todos,
-                            show_all=all,
-                            user_id=user_id,
-                            conn=conn,
-                            page=page - 1,
-                            total_pages=total_pages,
-                        ).as_markup(),
-                    )
-                    await state.update_data(page=page - 1)
+                todo_page = await todo_page_cache.get_page(
+                    conn, user_id=user_id, before=page_start
+                )
+                page -= 1
             else:
                 logger.info("on first page")
                 await callback.answer()
+                return
+        else:
+            return
+        await release_connection(conn)
+
+        if todo_page.rows:
+            all = data.get("all")
+            await callback.message.edit_text(
+                text=f"page:{page} reminder:",
+                reply_markup=build_todo_keyboard(
+                    todos=todo_page.rows,
+                    show_all=all,
+                    user_id=user_id,
+                    conn=conn,
+                    page=page,
+                    total_pages=todo_page.total_pages,
+                    bulk=data.get("bulk", False),
+                    selected=data.get("selected") or (),
+                ).as_markup(),
+            )
+            await state.update_data(page=page, **page_state(todo_page))
 
     @message_router.callback_query(F.data == "cancel", StateFilter(None))
     async def cancel_show_todos(callback: CallbackQuery):
@@ -310,20 +360,23 @@ def register_handlers(message_router: Router, bot: Bot):
         callback: CallbackQuery, state: FSMContext, conn: AsyncConnection
     ):
         data = await state.get_data()
-        todos = data.get("todos")
+        page, todo_page = await refresh_todo_page(
+            conn, user_id=callback.from_user.id, data=data
+        )
+        await release_connection(conn)
         all = False
-        await state.update_data(all=all)
-        page = data.get("page")
-        total_pages = data.get("total_pages")  # crutch
+        await state.update_data(all=all, page=page, **page_state(todo_page))
         await callback.message.edit_text(
             text="Активные напоминания:",
             reply_markup=build_todo_keyboard(
-                todos=todos,
+                todos=todo_page.rows,
                 show_all=False,
                 user_id=callback.from_user.id,
                 conn=conn,
                 page=page,
-                total_pages=total_pages,
+                total_pages=todo_page.total_pages,
+                bulk=data.get("bulk", False),
+                selected=data.get("selected") or (),
             ).as_markup(),
         )
 
@@ -332,153 +385,262 @@ def register_handlers(message_router: Router, bot: Bot):
         callback: CallbackQuery, state: FSMContext, conn: AsyncConnection
     ):
         data = await state.get_data()
-        todos = data.get("todos")
+        page, todo_page = await refresh_todo_page(
+            conn, user_id=callback.from_user.id, data=data
+        )
+        await release_connection(conn)
         all = True
-        await state.update_data(all=all)
-        page = data.get("page")
-        total_pages = data.get("total_pages")
+        await state.update_data(all=all, page=page, **page_state(todo_page))
         await callback.message.edit_text(
             text="Все напоминания:",
             reply_markup=build_todo_keyboard(
-                todos=todos,
+                todos=todo_page.rows,
                 show_all=True,
                 user_id=callback.from_user.id,
                 conn=conn,
                 page=page,
-                total_pages=total_pages,
+                total_pages=todo_page.total_pages,
+                bulk=data.get("bulk", False),
+                selected=data.get("selected") or (),
             ).as_markup(),
         )
 
     @message_router.callback_query(TodoFactory.filter())
     async def done_button_pressed(
-        callback: CallbackQuery, conn: AsyncConnection, state: FSMContext
+        callback: CallbackQuery,
+        callback_data: TodoFactory,
+        conn: AsyncConnection,
+        state: FSMContext,
     ):
-        boolean = None
+        todo_id = decode_id(callback_data.id)
+        if todo_id is None:
+            await callback.answer()
+            return
         user_id = callback.from_user.id
         data = await state.get_data()
-        todos = data.get("todos")
         all = data.get("all")
+        # показанная страница ещё в кэше: берём её до изменения
+        shown = await todo_page_cache.get_page(
+            conn, user_id=user_id, start=load_cursor(data.get("page_start"))
+        )
 
-        text = callback.data
-        todo = str(callback.data.split(":")[1])
-
-        if "True" in str(text):
-            boolean = False
-
-        elif "False" in str(text):
-            boolean = True
-
-        await change_todo_status(conn=conn, boolean=boolean, user_id=user_id, todo=todo)
-        # new todos
-        page = data.get("page")
-        if not page:
-            page = 1
-
-        get_todos = await get_todo_list(
-            conn=conn, user_id=callback.from_user.id, page=page
-        )
-        if get_todos:
-            mapped_todos = [
-                {
-                    "todo": todo,
-                    "reminder_time": reminder_time.isoformat()
-                    if reminder_time
-                    else None,
-                    "done": done,
-                    "timezone": timezone,
-                }
-                for todo, reminder_time, done, timezone in get_todos
-            ]
-
-            await state.update_data(todos=mapped_todos)
-        else:
-            await callback.message.edit_text(text=commands_ru["no_todos"])
+        boolean = not callback_data.done
 
-        data = await state.get_data()
-        todos = data.get("todos")
-        page = data.get("page")
-        total_pages = await get_total_pages(conn=conn, user_id=user_id)
-        await state.update_data(total_pages=total_pages)
-
-        task = scheduled_tasks.pop((user_id, todo), None)
-        if task:
-            task.cancel()
-            logger.info(f"task: {todo} cancelled")
+        todo_ids = await todo_page_cache.change_todo_status(
+            conn, boolean=boolean, user_id=user_id, todo_id=todo_id
+        )
+        await release_connection(conn)
+        # отменяем только то, что изменил запрос с user_id: в планировщике
+        # напоминания всех пользователей
+        if reminder_scheduler.cancel_many(todo_ids):
+            logger.info(f"task: {todo_id} cancelled")
         else:
-            logger.info(f"task: {todo} does not exist")
+            logger.info(f"task: {todo_id} does not exist")
+
+        patched = patch_todos(
+            callback.message.reply_markup,
+            todos=shown.rows,
+            todo_ids=todo_ids,
+            show_all=all,
+            done=boolean,
+        )
+        if patched is not None:
+            markup, _ = patched
+            await callback.message.edit_reply_markup(reply_markup=markup)
+            return
 
-        await callback.message.edit_text(
-            text="all reminders",
-            reply_markup=build_todo_keyboard(
-                todos=todos,
-                show_all=all,
-                user_id=callback.from_user.id,
-                conn=conn,
-                page=page,
-                total_pages=total_pages,
-            ).as_markup(),
+        await redraw_todo_page(
+            callback, conn=conn, state=state, data=data, text="all reminders"
         )
 
     @message_router.callback_query(TodoDeleteFactory.filter())
     async def delete_button_pressed(
-        callback: CallbackQuery, conn: AsyncConnection, state: FSMContext
+        callback: CallbackQuery,
+        callback_data: TodoDeleteFactory,
+        conn: AsyncConnection,
+        state: FSMContext,
     ):
+        todo_id = decode_id(callback_data.id)
+        if todo_id is None:
+            await callback.answer()
+            return
         user_id = callback.from_user.id
         data = await state.get_data()
-
         all = data.get("all")
+        shown = await todo_page_cache.get_page(
+            conn, user_id=user_id, start=load_cursor(data.get("page_start"))
+        )
 
-        text = callback.data
-        todo = str(text.split(":")[1])
-
-        await remove_todo(conn=conn, user_id=user_id, todo=todo)
-        page = data.get("page")
-        if not page:
-            page = 1
-        # new todos
-
-        get_todos = await get_todo_list(
-            conn=conn, user_id=callback.from_user.id, page=page
-        )
-        if len(get_todos) > 0:
-            mapped_todos = [
-                {
-                    "todo": todo,
-                    "reminder_time": reminder_time.isoformat()
-                    if reminder_time
-                    else None,
-                    "done": done,
-                    "timezone": timezone,
-                }
-                for todo, reminder_time, done, timezone in get_todos
-            ]
-            await state.update_data(todos=mapped_todos)
+        todo_ids = await todo_page_cache.remove_todo(
+            conn, user_id=user_id, todo_id=todo_id
+        )
+        await release_connection(conn)
+        if reminder_scheduler.cancel_many(todo_ids):
+            logger.info(f"task: {todo_id} cancelled")
         else:
-            await callback.message.edit_text(text=commands_ru["no_todos"])
-            await state.update_data(todos=[])
+            logger.info(f"task: {todo_id} does not exist")
+
+        patched = patch_todos(
+            callback.message.reply_markup,
+            todos=shown.rows,
+            todo_ids=todo_ids,
+            show_all=all,
+            done=None,
+        )
+        # если страница опустела, перерисовываем её целиком
+        if patched is not None and patched[1]:
+            markup, _ = patched
+            remaining = replace(shown, total=shown.total - len(todo_ids))
+            total_pages = remaining.total_pages
+            if total_pages != shown.total_pages:
+                markup = patch_page_counter(markup, data.get("page") or 1, total_pages)
+            await callback.message.edit_reply_markup(reply_markup=markup)
+            return
+
+        await redraw_todo_page(
+            callback, conn=conn, state=state, data=data, text="Все напоминания:"
+        )
 
+    @message_router.callback_query(F.data == "bulk")
+    async def bulk_mode(
+        callback: CallbackQuery, state: FSMContext, conn: AsyncConnection
+    ):
         data = await state.get_data()
-        todos = data.get("todos")
-        page = data.get("page")
-        total_pages = await get_total_pages(conn=conn, user_id=user_id)
-        await state.update_data(total_pages=total_pages)  # crutch
-        await callback.message.edit_text(
+        await state.update_data(bulk=True, selected=[])
+        await redraw_todo_page(
+            callback,
+            conn=conn,
+            state=state,
+            data={**data, "bulk": True, "selected": []},
+            text="Выберите напоминания:",
+        )
+
+    @message_router.callback_query(F.data == "bulk_exit")
+    async def bulk_exit(
+        callback: CallbackQuery, state: FSMContext, conn: AsyncConnection
+    ):
+        data = await state.get_data()
+        await state.update_data(bulk=False, selected=[])
+        await redraw_todo_page(
+            callback,
+            conn=conn,
+            state=state,
+            data={**data, "bulk": False, "selected": []},
             text="Все напоминания:",
+        )
+
+    @message_router.callback_query(TodoSelectFactory.filter())
+    async def select_todo(
+        callback: CallbackQuery,
+        callback_data: TodoSelectFactory,
+        state: FSMContext,
+        conn: AsyncConnection,
+    ):
+        todo_id = decode_id(callback_data.id)
+        if todo_id is None:
+            await callback.answer()
+            return
+        data = await state.get_data()
+        # выбор хранится в FSM как список id и переживает смену страницы
+        selected = set(data.get("selected") or ())
+        selected ^= {todo_id}
+        selected = sorted(selected)
+        await state.update_data(selected=selected)
+        page, todo_page = await refresh_todo_page(
+            conn, user_id=callback.from_user.id, data=data
+        )
+        await release_connection(conn)
+        await callback.message.edit_reply_markup(
             reply_markup=build_todo_keyboard(
-                todos=todos,
-                show_all=all,
+                todos=todo_page.rows,
+                show_all=data.get("all"),
                 user_id=callback.from_user.id,
                 conn=conn,
                 page=page,
-                total_pages=total_pages,
-            ).as_markup(),
+                total_pages=todo_page.total_pages,
+                bulk=True,
+                selected=selected,
+            ).as_markup()
+        )
+
+    @message_router.callback_query(F.data.in_(["bulk_delete", "delete_done"]))
+    async def confirm_delete(callback: CallbackQuery, state: FSMContext):
+        if callback.data == "bulk_delete":
+            data = await state.get_data()
+            selected = data.get("selected") or []
+            if not selected:
+                await callback.answer("Ничего не выбрано")
+                return
+            text = f"Удалить выбранные напоминания ({len(selected)})?"
+        else:
+            text = "Удалить все выполненные напоминания?"
+        await callback.message.edit_text(
+            text=f"{text} Это действие нельзя отменить.",
+            reply_markup=confirm_keyboard(callback.data),
         )
-        task = scheduled_tasks.pop((user_id, todo), None)
-        if task:
-            task.cancel()
-            logger.info(f"task: {todo} cancelled")
+
+    @message_router.callback_query(F.data == "confirm_no")
+    async def cancel_delete(
+        callback: CallbackQuery, state: FSMContext, conn: AsyncConnection
+    ):
+        data = await state.get_data()
+        await redraw_todo_page(
+            callback, conn=conn, state=state, data=data, text="Все напоминания:"
+        )
+
+    @message_router.callback_query(F.data.in_(["bulk_done", "bulk_delete:yes"]))
+    async def bulk_selected(
+        callback: CallbackQuery, state: FSMContext, conn: AsyncConnection
+    ):
+        user_id = callback.from_user.id
+        data = await state.get_data()
+        selected = data.get("selected") or []
+        if not selected:
+            await callback.answer("Ничего не выбрано")
+            return
+        if callback.data == "bulk_done":
+            todo_ids = await todo_page_cache.set_todos_status(
+                conn, done=True, user_id=user_id, todo_ids=selected
+            )
         else:
-            logger.info(f"task: {todo} does not exist")
+            todo_ids = await todo_page_cache.remove_todos(
+                conn, user_id=user_id, todo_ids=selected
+            )
+        await finish_bulk(
+            callback,
+            conn=conn,
+            state=state,
+            data=data,
+            todo_ids=todo_ids,
+            text="Все напоминания:",
+        )
+
+    @message_router.callback_query(F.data.in_(["complete_past", "delete_done:yes"]))
+    async def bulk_by_status(
+        callback: CallbackQuery, state: FSMContext, conn: AsyncConnection
+    ):
+        user_id = callback.from_user.id
+        data = await state.get_data()
+        if callback.data == "complete_past":
+            todo_ids = await todo_page_cache.complete_past_todos(conn, user_id=user_id)
+        else:
+            todo_ids = await todo_page_cache.remove_done_todos(conn, user_id=user_id)
+        if not todo_ids:
+            await callback.answer("Подходящих напоминаний нет")
+            if callback.data != "complete_past":
+                # убираем вопрос подтверждения
+                await redraw_todo_page(
+                    callback, conn=conn, state=state, data=data, text="Все напоминания:"
+                )
+            return
+        await finish_bulk(
+            callback,
+            conn=conn,
+            state=state,
+            data=data,
+            todo_ids=todo_ids,
+            text="Все напоминания:",
+        )
 
     @message_router.message(Command(commands="time"), StateFilter(None))
     async def pick_timezone(message: Message, state: FSMContext):
@@ -521,20 +683,51 @@ def register_handlers(message_router: Router, bot: Bot):
         )
 
     @message_router.message(
-        StateFilter(DatePicker.pick_country), lambda x: x and x.text.isalpha()
+        StateFilter(DatePicker.pick_country), lambda x: x and is_city_name(x.text)
     )
-    async def normal_country(message: Message, state: FSMContext):
+    async def normal_country(
+        message: Message, state: FSMContext, conn: AsyncConnection
+    ):
         country = message.text.strip().capitalize()
         data = await state.get_data()
         region = data["region"]
-        if available_timezone(region=region, city=country):
+        timezone_index = get_timezone_index()
+        user_timezone = timezone_index.resolve(region=region, city=country)
+        if user_timezone:
             await state.set_state(None)
-            await state.update_data(country=country)
-            await message.answer(f"Параметры {region}/{country} успешно установлены!")
+            updated = await user_cache.set_user_timezone(
+                conn, user_id=message.from_user.id, user_timezone=user_timezone
+            )
+            if not updated:
+                # пользователь ещё не вызывал /start: сначала создаём его строку
+                await user_cache.add_user(
+                    conn,
+                    user_id=message.from_user.id,
+                    username=message.from_user.username,
+                    language=message.from_user.language_code,
+                    role=UserRole.USER,
+                )
+                updated = await user_cache.set_user_timezone(
+                    conn, user_id=message.from_user.id, user_timezone=user_timezone
+                )
+            await release_connection(conn)
+            if updated:
+                await message.answer(f"Параметры {user_timezone} успешно установлены!")
+            else:
+                await message.answer(
+                    "Не удалось сохранить часовой пояс. Отправьте /start и попробуйте снова"
+                )
 
         else:
+            suggestions = timezone_index.suggest(region=region, city=country)
+            hint = ""
+            if suggestions:
+                hint = "\n Возможно, вы имели в виду: " + ", ".join(
+                    zone.split("/", 1)[1] for zone in suggestions
+                )
             await message.answer(
                 f"К сожалению для ({region}/{country}) нет настроек часового пояса в базе данных. \n Пожалуйста, напишите другой город или используйте команду /cancel"
+                + hint
             )
 
     @message_router.message(
@@ -600,9 +793,7 @@ def register_handlers(message_router: Router, bot: Bot):
         month_id = (current_month - 1) % 12
         await callback.message.edit_text(
             "Pick a date:",
-            reply_markup=create_kb_month(
-                month_id=month_id, year=current_year
-            ).as_markup(),
+            reply_markup=month_keyboard(month_id=month_id, year=int(current_year)),
         )
 
     @message_router.message(StateFilter(DatePicker.pick_date))
@@ -627,9 +818,7 @@ def register_handlers(message_router: Router, bot: Bot):
         month_id = (next_month - 1) % 12
         await callback.message.edit_text(
             text="Pick a date:",
-            reply_markup=create_kb_month(
-                month_id=month_id, year=current_year
-            ).as_markup(),
+            reply_markup=month_keyboard(month_id=month_id, year=int(current_year)),
         )
         await state.update_data(current_month=next_month)
 
@@ -649,9 +838,7 @@ def register_handlers(message_router: Router, bot: Bot):
         month_id = (prev_month - 1) % 12
         await callback.message.edit_text(
             text="Pick a date:",
-            reply_markup=create_kb_month(
-                month_id=month_id, year=current_year
-            ).as_markup(),
+            reply_markup=month_keyboard(month_id=month_id, year=int(current_year)),
         )
         await state.update_data(current_month=prev_month)
 
@@ -708,14 +895,11 @@ def register_handlers(message_router: Router, bot: Bot):
         reminder_datetime = datetime.strptime(
             f"{year}-{month}-{day} {hour}:{minutes}", "%Y-%m-%d %H:%M"
         )
-        region = data.get("region")
-        country = data.get("country")
-        if not region:
-            user_timezone = defaut_timezone
-        else:
-            user_timezone = f"{region}/{country}"
+        user_timezone = await user_cache.get_user_timezone(
+            conn, user_id=message.from_user.id
+        )
 
-        reminder_datetime = reminder_datetime.replace(tzinfo=ZoneInfo(user_timezone))
+        reminder_datetime = reminder_datetime.replace(tzinfo=get_zone(user_timezone))
 
         done = False
         if reminder_datetime.astimezone(timezone.utc) < datetime.now(
@@ -723,7 +907,7 @@ def register_handlers(message_router: Router, bot: Bot):
         ):  # time format utc and not
             done = True
 
-        await add_todo(
+        todo_id = await todo_page_cache.add_todo(
             conn,
             user_id=message.from_user.id,
             username=message.from_user.username,
@@ -732,23 +916,22 @@ def register_handlers(message_router: Router, bot: Bot):
             reminder_time=reminder_datetime.astimezone(timezone.utc),
             user_timezone=user_timezone,
         )
+        await release_connection(conn)
 
         await message.answer(f"Напомню {todo} в {hour}:{minutes}  {day}.{month}.{year}")
-        total_pages = await get_total_pages(conn=conn, user_id=message.from_user.id)
-        await state.update_data(total_pages=total_pages)
 
-        task = asyncio.create_task(
-            schedule_reminder(
-                bot=bot,
+        # напоминание чужой партиции подхватит диспетчер узла-владельца
+        if (
+            todo_id is not None
+            and reminder_scheduler.running
+            and reminder_scheduler.owns(message.from_user.id)
+        ):
+            reminder_scheduler.schedule(
+                todo_id,
                 chat_id=message.from_user.id,
                 todo=todo,
-                reminder_datetime=reminder_datetime.astimezone(timezone.utc),
+                reminder_time=reminder_datetime.astimezone(timezone.utc),
             )
-        )
-        if task not in scheduled_tasks:
-            scheduled_tasks[(message.from_user.id, todo)] = task
-        else:
-            logger.info("this task already exist")
 
         await state.clear()
 
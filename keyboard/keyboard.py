@@ -1,13 +1,16 @@
 from logging import basicConfig
 from config.config import Config, load_config
-from sql.todo_actions import get_total_pages
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from aiogram.filters.callback_data import CallbackData
 from datetime import datetime
-from zoneinfo import ZoneInfo
+from functools import lru_cache
+from typing import Collection
+import calendar
+from timezones.timezones import get_zone
 import logging
 from psycopg import AsyncConnection
+from sql.todo_actions import Todo
 
 config: Config = load_config()
 logging.basicConfig(
@@ -28,15 +31,40 @@ keyboard_markup = InlineKeyboardMarkup(
 )
 
 
+BASE36_DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+BASE36_SET = frozenset(BASE36_DIGITS)
+
+
+def encode_id(value: int) -> str:
+    digits = []
+    while True:
+        value, digit = divmod(value, 36)
+        digits.append(BASE36_DIGITS[digit])
+        if not value:
+            return "".join(reversed(digits))
+
+
+def decode_id(value: str) -> int | None:
+    # callback_data приходит от клиента: None для всего, что не выдал
+    # encode_id (int() принял бы "-1", "+z", "1_0" и пробелы)
+    if not value or len(value) > 12 or not set(value) <= BASE36_SET:
+        return None
+    return int(value, 36)
+
+
+# в callback_data только id напоминания в base36: длина не зависит от
+# текста и далека от лимита Telegram в 64 байта
 class TodoFactory(CallbackData, prefix="todos"):
-    todo_name: str
-    todo_time: str | None
-    todo_done: str
+    id: str
+    done: bool
 
 
 class TodoDeleteFactory(CallbackData, prefix="delete"):
-    todo_name: str
-    todo_done: str
+    id: str
+
+
+class TodoSelectFactory(CallbackData, prefix="select"):
+    id: str
 
 
 class DateFactory(CallbackData, prefix="months"):
@@ -53,6 +81,33 @@ class PageButton(CallbackData, prefix="pages"):
 
 cancel = InlineKeyboardButton(text="Отмена", callback_data="cancel")
 
+bulk_button = InlineKeyboardButton(text="Выбрать несколько", callback_data="bulk")
+complete_past_button = InlineKeyboardButton(
+    text="Завершить прошедшие", callback_data="complete_past"
+)
+delete_done_button = InlineKeyboardButton(
+    text="Удалить выполненные", callback_data="delete_done"
+)
+bulk_done_button = InlineKeyboardButton(
+    text="Выполнить выбранные", callback_data="bulk_done"
+)
+bulk_delete_button = InlineKeyboardButton(
+    text="Удалить выбранные", callback_data="bulk_delete"
+)
+bulk_exit_button = InlineKeyboardButton(text="Готово", callback_data="bulk_exit")
+
+
+# удаление безвозвратно: action выполняется только по "{action}:yes"
+def confirm_keyboard(action: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="Да, удалить", callback_data=f"{action}:yes"),
+                InlineKeyboardButton(text="Нет", callback_data="confirm_no"),
+            ]
+        ]
+    )
+
 
 months_ids = [i for i in range(0, 12)]
 months_names = [
@@ -69,7 +124,6 @@ months_names = [
     "Ноябрь",
     "Декабрь",
 ]
-months_days = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
 
 regions = [
     "Africa",
@@ -107,7 +161,7 @@ def create_kb_month(month_id: int, year: int) -> InlineKeyboardBuilder:
     kb = []
 
     kb_builder = InlineKeyboardBuilder()
-    days = months_days[month_id]
+    days = calendar.monthrange(year, month_id + 1)[1]
     month_button_text: str = months_names[month_id] + " " + str(year)
     month_button = InlineKeyboardButton(
         text=month_button_text, callback_data=str(month_id)
@@ -129,13 +183,116 @@ def create_kb_month(month_id: int, year: int) -> InlineKeyboardBuilder:
     return kb_builder
 
 
+# клавиатура месяца зависит только от (month_id, year), поэтому навигация
+# по календарю отдаёт готовую разметку из кэша
+@lru_cache(maxsize=48)
+def month_keyboard(month_id: int, year: int) -> InlineKeyboardMarkup:
+    return create_kb_month(month_id=month_id, year=year).as_markup()
+
+
+def todo_row_key(todo_id: int) -> str:
+    return f"todo:{encode_id(todo_id)}"
+
+
+# строка списка зависит только от (id, текст, done, время, часовой пояс):
+# повторные перерисовки страницы берут готовые кнопки из кэша
+@lru_cache(maxsize=4096)
+def render_todo_row(
+    todo_id: int,
+    todo: str,
+    done: bool,
+    reminder_time: datetime,
+    user_timezone: str | None,
+) -> tuple[InlineKeyboardButton, ...]:
+    reminder_datetime = reminder_time.astimezone(get_zone(user_timezone))
+
+    done_symbol = "☑" if done else "☐"
+    delete_symbol = "⌫ "
+
+    reminder_datetime_text = reminder_datetime.strftime("%Y-%m-%d %H-%M")
+
+    action = InlineKeyboardButton(
+        text=f"{todo} {reminder_datetime_text[5:]}",
+        callback_data=todo_row_key(todo_id),
+    )
+    done_button = InlineKeyboardButton(
+        text=done_symbol,
+        callback_data=TodoFactory(id=encode_id(todo_id), done=done).pack(),
+    )
+    delete_button = InlineKeyboardButton(
+        text=delete_symbol,
+        callback_data=TodoDeleteFactory(id=encode_id(todo_id)).pack(),
+    )
+    return action, done_button, delete_button
+
+
+# строка режима выбора: одна кнопка-переключатель на напоминание
+@lru_cache(maxsize=4096)
+def render_select_row(
+    todo_id: int,
+    todo: str,
+    done: bool,
+    reminder_time: datetime,
+    user_timezone: str | None,
+    selected: bool,
+) -> tuple[InlineKeyboardButton, ...]:
+    reminder_datetime = reminder_time.astimezone(get_zone(user_timezone))
+    select_symbol = "☑" if selected else "☐"
+    done_mark = " ✓" if done else ""
+    toggle = InlineKeyboardButton(
+        text=f"{select_symbol} {todo} {reminder_datetime.strftime('%m-%d %H-%M')}"
+        f"{done_mark}",
+        callback_data=TodoSelectFactory(id=encode_id(todo_id)).pack(),
+    )
+    return (toggle,)
+
+
+def patch_todo_keyboard(
+    markup: InlineKeyboardMarkup,
+    todo_id: int,
+    row: tuple[InlineKeyboardButton, ...] | None,
+) -> InlineKeyboardMarkup | None:
+    # заменяет (или удаляет, если row is None) одну строку уже отправленной
+    # клавиатуры; None - строки с таким id на клавиатуре нет
+    key = todo_row_key(todo_id)
+    rows = list(markup.inline_keyboard)
+    for index, buttons in enumerate(rows):
+        if buttons and buttons[0].callback_data == key:
+            if row is None:
+                del rows[index]
+            else:
+                rows[index] = list(row)
+            return InlineKeyboardMarkup(inline_keyboard=rows)
+    return None
+
+
+def page_label(page: int, total_pages: int) -> str:
+    return f"Страница {page}/{total_pages}"
+
+
+def patch_page_counter(
+    markup: InlineKeyboardMarkup, page: int, total_pages: int
+) -> InlineKeyboardMarkup:
+    # счётчик страниц - средняя кнопка первой строки, её callback_data - номер
+    rows = [list(buttons) for buttons in markup.inline_keyboard]
+    for index, button in enumerate(rows[0] if rows else ()):
+        if button.callback_data == str(page):
+            rows[0][index] = button.model_copy(
+                update={"text": page_label(page, total_pages)}
+            )
+            return InlineKeyboardMarkup(inline_keyboard=rows)
+    return markup
+
+
 def build_todo_keyboard(
-    todos: list,
+    todos: list[Todo],
     show_all: bool,
     user_id: int,
     conn: AsyncConnection,
     page: int | None,
     total_pages: int,
+    bulk: bool = False,
+    selected: Collection[int] = (),
 ) -> InlineKeyboardBuilder:
     kb_builder = InlineKeyboardBuilder()
     back = InlineKeyboardButton(
@@ -150,7 +307,7 @@ def build_todo_keyboard(
         page = 1
 
     page_button = InlineKeyboardButton(
-        text=f"Страница {page}/{total_pages}", callback_data=f"{page}"
+        text=page_label(page, total_pages), callback_data=f"{page}"
     )
 
     kb_builder.row(back, page_button, forward, width=3)
@@ -165,47 +322,32 @@ def build_todo_keyboard(
     else:
         kb_builder.row(show_all_button)
     for item in todos:
-        user_timezone = item.get("timezone") or "Europe/Moscow"
-        reminder_datetime = item.get("reminder_time")
-        reminder_datetime = datetime.fromisoformat(reminder_datetime)
-        reminder_datetime = reminder_datetime.replace(tzinfo=ZoneInfo(user_timezone))
-        done = item.get("done")
-        todo = item.get("todo")
-
-        done_symbol = "☐"
-        if str(done).lower() == "true":
-            done_symbol = "☑"
-        delete_symbol = "⌫ "
-
-        reminder_datetime_text = reminder_datetime.strftime("%Y-%m-%d %H-%M")
-
-        action = InlineKeyboardButton(
-            text=f"{todo} {reminder_datetime_text[5:]}", callback_data=todo
-        )
-        done_button = InlineKeyboardButton(
-            text=done_symbol,
-            callback_data=TodoFactory(
-                todo_name=todo.lower(),
-                todo_done=str(done),
-                todo_time=reminder_datetime_text,
-            ).pack(),
-        )
-        delete_button = InlineKeyboardButton(
-            text=delete_symbol,
-            callback_data=TodoDeleteFactory(
-                todo_name=todo.lower(),
-                todo_done=str(done),
-                todo_time=reminder_datetime_text,
-            ).pack(),
-        )
-
-        if not show_all:
-            if str(done).lower() == "true":
-                continue
-            else:
-                kb_builder.row(action, done_button, delete_button)
+        if not show_all and item.done:
+            continue
+        if bulk:
+            row = render_select_row(
+                todo_id=item.id,
+                todo=item.todo,
+                done=item.done,
+                reminder_time=item.reminder_time,
+                user_timezone=item.timezone,
+                selected=item.id in selected,
+            )
         else:
-            kb_builder.row(action, done_button, delete_button)
+            row = render_todo_row(
+                todo_id=item.id,
+                todo=item.todo,
+                done=item.done,
+                reminder_time=item.reminder_time,
+                user_timezone=item.timezone,
+            )
+        kb_builder.row(*row)
+    if bulk:
+        kb_builder.row(bulk_done_button, bulk_delete_button)
+        kb_builder.row(bulk_exit_button)
+    else:
+        kb_builder.row(bulk_button)
+        kb_builder.row(complete_past_button, delete_done_button)
     kb_builder.row(cancel)
     return kb_builder
 
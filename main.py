@@ -5,17 +5,30 @@ from config.config import load_config
 import logging
 from bot.bot import create_dispatcher
 from webhook.webhook import router as tg_router
+from webhook.ingestion import UpdateIngestion
 from locales.cmd import commands_ru, commands_en, commands_set_ru, commands_set_en
 from config.config import Config, load_config
-from handlers.handlers import restore_tasks
-import asyncio
+from handlers.handlers import send_reminder
+from scheduler.scheduler import reminder_scheduler
+from sender.sender import OutboundSender
+from sender.outbox import DeliveryWorker
+from scheduler.dispatcher import DueReminderDispatcher
+from scheduler.partitions import PartitionMembership
+from functools import partial
 import os
 from sql.connection import get_pg_pool
+from sql.migrations import migrate
+from sql.user_cache import user_cache
+from sql.todo_cache import todo_page_cache
+from sql.todo_actions import release_partition_claims
+from timezones.timezones import get_timezone_index
 from redis.asyncio import Redis
 import psycopg_pool
 from aiogram.fsm.storage.redis import RedisStorage
+from bot.storage import BufferedRedisStorage
 from middlewares.db_middlewares import DataBaseMiddleware
 from middlewares.activity_middleware import ActivityCounterMiddleware
+from middlewares.activity_buffer import ActivityBuffer
 from aiogram import Bot, Dispatcher
 from aiogram.types import BotCommand, BotCommandScopeAllPrivateChats
 from aiogram.client.default import DefaultBotProperties
@@ -31,15 +44,24 @@ async def lifespan(app: FastAPI):
     app.state.logger = logger
     config = load_config()
     app.state.config = config
-    storage = RedisStorage(
-        redis=Redis(
-            host=config.redis.host,
-            port=config.redis.port,
-            db=config.redis.db,
-            password=config.redis.password,
-            username=config.redis.username,
+    storage = BufferedRedisStorage(
+        RedisStorage(
+            redis=Redis(
+                host=config.redis.host,
+                port=config.redis.port,
+                db=config.redis.db,
+                password=config.redis.password,
+                username=config.redis.username,
+            )
         )
     )
+    await migrate(
+        db_name=config.db.name,
+        host=config.db.host,
+        port=config.db.port,
+        user=config.db.user,
+        password=config.db.password,
+    )
     db_pool: psycopg_pool.AsyncConnectionPool = await get_pg_pool(
         db_name=config.db.name,
         host=config.db.host,
@@ -50,16 +72,57 @@ async def lifespan(app: FastAPI):
         max_size=10,
     )
     app.state.db_pool = db_pool
+    user_cache.configure(config.cache, redis=storage.redis)
+    todo_page_cache.configure(config.cache, redis=storage.redis)
+    get_timezone_index()
+    sender = OutboundSender(bot=bot, settings=config.sender)
+    sender.start()
+    app.state.sender = sender
+    reminder_scheduler.configure(config.reminders)
+    # пока узел не получил партиции, напоминаний у него нет
+    reminder_scheduler.assign(config.reminders.partitions, frozenset())
+    outbox = DeliveryWorker(db_pool=db_pool, sender=sender, settings=config.outbox)
+    outbox.start()
+    reminder_scheduler.start(fire=partial(send_reminder, outbox, db_pool))
+    dispatcher = DueReminderDispatcher(
+        db_pool=db_pool, scheduler=reminder_scheduler, settings=config.reminders
+    )
+    dispatcher.start()
+    app.state.dispatcher = dispatcher
+
+    # напоминания шардированы по mod(user_id, partitions) между воркерами
+    async def rebalance_reminders(owned: frozenset[int], lost: frozenset[int]):
+        reminder_scheduler.assign(config.reminders.partitions, owned)
+        if lost:
+            async with db_pool.connection() as conn:
+                await release_partition_claims(
+                    conn, partitions=config.reminders.partitions, lost=sorted(lost)
+                )
+
+    membership = PartitionMembership(
+        storage.redis,
+        prefix="reminders",
+        partitions=config.reminders.partitions,
+        lease=config.reminders.node_lease,
+        on_change=rebalance_reminders,
+        on_members=sender.set_workers,
+    )
+    membership.start()
+    app.state.membership = membership
 
-    # async with db_pool.connection() as conn:
-    #  await restore_tasks(bot=bot, conn=conn)
-    # logger.debug("restore_tasks is running")
     dp = create_dispatcher(storage=storage, bot=bot)
     logger.info("Including middlewares...")
-    dp.update.middleware(DataBaseMiddleware())
-    dp.update.middleware(ActivityCounterMiddleware())
+    dp.update.middleware(DataBaseMiddleware(db_pool=db_pool))
+    activity_buffer = ActivityBuffer(db_pool=db_pool, settings=config.activity)
+    activity_buffer.start()
+    dp.update.middleware(ActivityCounterMiddleware(buffer=activity_buffer))
     app.state.storage = storage
     app.state.dp = dp
+    ingestion = None
+    if config.webhook.use_queue:
+        ingestion = UpdateIngestion(bot=bot, dp=dp, settings=config.webhook)
+        ingestion.start()
+    app.state.ingestion = ingestion
     await bot.set_my_commands([])
     await set_main_menu_commands(bot=bot, lang="ru")
     WEBHOOK_URL = os.getenv("WEBHOOK_URL")
@@ -67,6 +130,14 @@ async def lifespan(app: FastAPI):
 
     yield
     await bot.delete_webhook()
+    if ingestion is not None:
+        await ingestion.stop()
+    await activity_buffer.stop()
+    await membership.stop()
+    await dispatcher.stop()
+    await reminder_scheduler.stop()
+    await outbox.stop()
+    await sender.stop()
     await bot.session.close()
     await storage.close()
     await app.state.db_pool.close()
@@ -81,19 +152,6 @@ async def ping():
     return {"status": "alive"}
 
 
-async def start_restore_tasks(app: FastAPI):
-    async def run():
-        # каждое соединение берём заново, чтобы не блокировать пул
-        async with app.state.db_pool.connection() as conn:
-            await restore_tasks(bot=app.state.bot, conn=conn)
-            app.state.logger.info("restore_tasks finished")
-
-    asyncio.create_task(run())
-
-
-start_restore_tasks(app=app)
-
-
 async def main(app: FastAPI):
     #
 
@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timezone
+
+from psycopg_pool import AsyncConnectionPool
+
+from config.config import ActivitySettings
+from sql.actions import add_user_activity_batch
+
+logger = logging.getLogger(__name__)
+
+
+# счётчики активности копятся в памяти и сбрасываются в БД одним
+# multi-row upsert по таймеру или при превышении max_keys
+class ActivityBuffer:
+    def __init__(self, db_pool: AsyncConnectionPool, settings: ActivitySettings) -> None:
+        self._db_pool = db_pool
+        self._flush_interval = settings.flush_interval
+        self._max_keys = settings.max_keys
+        # (user_id, минута): дату по ней вычисляет БД, см. add_user_activity_batch
+        self._counts: Counter[tuple[int, datetime]] = Counter()
+        self._task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+        self._pending_flush: asyncio.Task | None = None
+
+    def add(self, user_id: int) -> None:
+        minute = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        self._counts[(user_id, minute)] += 1
+        if len(self._counts) >= self._max_keys and self._pending_flush is None:
+            self._pending_flush = asyncio.create_task(self.flush())
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run(), name="activity-flush")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        async with self._flush_lock:
+            self._pending_flush = None
+            if not self._counts:
+                return
+            counts, self._counts = self._counts, Counter()
+            rows = [(user_id, minute, n) for (user_id, minute), n in counts.items()]
+            try:
+                async with self._db_pool.connection() as conn:
+                    async with conn.transaction():
+                        await add_user_activity_batch(conn, rows=rows)
+            except Exception as e:
+                # не теряем счётчики: вернём их в буфер до следующей попытки
+                self._counts.update(counts)
+                logger.exception("Failed to flush user activity: %s", e)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._flush_interval)
+            await self.flush()
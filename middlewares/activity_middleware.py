@@ -3,13 +3,15 @@ from typing import Any, Awaitable, Callable
 
 from aiogram import BaseMiddleware
 from aiogram.types import Update, User
-from sql.actions import add_user_activity
-from psycopg import AsyncConnection
+from middlewares.activity_buffer import ActivityBuffer
 
 logger = logging.getLogger(__name__)
 
 
 class ActivityCounterMiddleware(BaseMiddleware):
+    def __init__(self, buffer: ActivityBuffer) -> None:
+        self.buffer = buffer
+
     async def __call__(
         self,
         handler: Callable[[Update, dict[str, Any]], Awaitable[Any]],
@@ -22,11 +24,6 @@ class ActivityCounterMiddleware(BaseMiddleware):
 
         result = await handler(event, data)
 
-        conn: AsyncConnection = data.get("conn")
-        if conn is None:
-            logger.error("No database connection found in middleware data.")
-            raise RuntimeError("Missing database connection for activity logging.")
-
-        await add_user_activity(conn, user_id=user.id)
+        self.buffer.add(user.id)
 
         return result
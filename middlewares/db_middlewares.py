@@ -3,33 +3,125 @@ from typing import Any, Awaitable, Callable
 
 from aiogram import BaseMiddleware
 from aiogram.types import Update
+from psycopg import AsyncConnection, AsyncCursor
 from psycopg_pool import AsyncConnectionPool
 
 logger = logging.getLogger(__name__)
 
 
+# соединение берётся из пула только при первом обращении к БД,
+# поэтому апдейты без SQL (/help, календарь, выбор часового пояса) пул не занимают
+class LazyConnection:
+    def __init__(self, db_pool: AsyncConnectionPool) -> None:
+        self._db_pool = db_pool
+        self._connection: AsyncConnection | None = None
+        self._transaction = None
+        self._after_commit: list[Callable[[], Awaitable[Any]]] = []
+
+    @property
+    def acquired(self) -> bool:
+        return self._connection is not None
+
+    async def get(self) -> AsyncConnection:
+        if self._connection is None:
+            connection = await self._db_pool.getconn()
+            try:
+                transaction = connection.transaction()
+                await transaction.__aenter__()
+            except BaseException:
+                await self._db_pool.putconn(connection)
+                raise
+            self._connection = connection
+            self._transaction = transaction
+        return self._connection
+
+    def after_commit(self, callback: Callable[[], Awaitable[Any]]) -> None:
+        # инвалидация кэшей: до фиксации параллельный промах перечитал бы
+        # и закэшировал старую строку; при откате колбэки не вызываются
+        self._after_commit.append(callback)
+
+    def cursor(self, *args: Any, **kwargs: Any) -> "_LazyContext":
+        return _LazyContext(self, "cursor", args, kwargs)
+
+    def transaction(self, *args: Any, **kwargs: Any) -> "_LazyContext":
+        return _LazyContext(self, "transaction", args, kwargs)
+
+    async def release(self, error: BaseException | None = None) -> None:
+        connection, transaction = self._connection, self._transaction
+        callbacks, self._after_commit = self._after_commit, []
+        if connection is None:
+            return
+        self._connection = self._transaction = None
+        try:
+            if error is None:
+                await transaction.__aexit__(None, None, None)
+            else:
+                await transaction.__aexit__(type(error), error, error.__traceback__)
+        finally:
+            await self._db_pool.putconn(connection)
+        if error is not None:
+            return
+        for callback in callbacks:
+            try:
+                await callback()
+            except Exception as e:
+                logger.exception("After-commit callback failed: %s", e)
+
+
+async def release_connection(conn: Any) -> None:
+    # хендлер закончил работу с БД: фиксируем транзакцию и возвращаем
+    # соединение в пул до вызовов Telegram API; повторное обращение к БД
+    # возьмёт новое соединение, а release() в middleware станет no-op
+    if isinstance(conn, LazyConnection):
+        await conn.release()
+
+
+class _LazyContext:
+    def __init__(
+        self, lazy: LazyConnection, method: str, args: tuple, kwargs: dict
+    ) -> None:
+        self._lazy = lazy
+        self._method = method
+        self._args = args
+        self._kwargs = kwargs
+        self._context = None
+
+    async def __aenter__(self) -> AsyncCursor | Any:
+        connection = await self._lazy.get()
+        self._context = getattr(connection, self._method)(*self._args, **self._kwargs)
+        return await self._context.__aenter__()
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> Any:
+        return await self._context.__aexit__(exc_type, exc_value, traceback)
+
+
 class DataBaseMiddleware(BaseMiddleware):
+    def __init__(self, db_pool: AsyncConnectionPool | None = None) -> None:
+        self.db_pool = db_pool
+
     async def __call__(
         self,
         handler: Callable[[Update, dict[str, Any]], Awaitable[Any]],
         event: Update,
         data: dict[str, Any],
     ) -> Any:
-        db_pool: AsyncConnectionPool = data.get("db_pool")
+        db_pool: AsyncConnectionPool = self.db_pool or data.get("db_pool")
 
         if db_pool is None:
             logger.error("Database pool is not provided in middleware data.")
             raise RuntimeError("Missing db_pool in middleware context.")
 
-        async with db_pool.connection() as connection:
-            try:
-                async with connection.transaction():
-                    data["conn"] = connection
-                    result = await handler(event, data)
-            except Exception as e:
+        connection = LazyConnection(db_pool)
+        data["conn"] = connection
+        try:
+            result = await handler(event, data)
+        except Exception as e:
+            if connection.acquired:
                 logger.exception("Transaction rolled back due to error: %s", e)
-                raise
-        
-        # Здесь может быть какой-то код, который выполнится в случае успешного завершения транзакции        
+            await connection.release(e)
+            raise
+        await connection.release()
+
+        # Здесь может быть какой-то код, который выполнится в случае успешного завершения транзакции
 
-        return result
\ No newline at end of file
+        return result
@@ -0,0 +1,24 @@
+import logging
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update
+from bot.storage import BufferedRedisStorage
+
+logger = logging.getLogger(__name__)
+
+
+# открывает буферизованную FSM-сессию на время обработки апдейта; должна
+# стоять перед FSMContextMiddleware, чтобы его get_state тоже попал в сессию
+class FSMSessionMiddleware(BaseMiddleware):
+    def __init__(self, storage: BufferedRedisStorage) -> None:
+        self.storage = storage
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> Any:
+        async with self.storage.session():
+            return await handler(event, data)
@@ -3,7 +3,12 @@ from fastapi import FastAPI
 from webhook.webhook import router as tg_router
 from locales.cmd import commands_ru, commands_en, commands_set_ru, commands_set_en
 from config.config import Config, load_config
-from handlers.handlers import restore_tasks
+from handlers.handlers import send_reminder
+from scheduler.scheduler import reminder_scheduler
+from sender.sender import OutboundSender
+from sender.outbox import DeliveryWorker
+from scheduler.dispatcher import DueReminderDispatcher
+from functools import partial
 import asyncio
 import logging
 import os
@@ -14,6 +19,7 @@ import psycopg_pool
 from aiogram.fsm.storage.redis import RedisStorage
 from middlewares.db_middlewares import DataBaseMiddleware
 from middlewares.activity_middleware import ActivityCounterMiddleware
+from middlewares.activity_buffer import ActivityBuffer
 from aiogram import Bot, Dispatcher
 from aiogram.types import BotCommand, BotCommandScopeAllPrivateChats
 from aiogram.client.default import DefaultBotProperties
@@ -77,13 +83,24 @@ async def main(config: Config):
         user=config.db.user,
         password=config.db.password,
     )
-    async with db_pool.connection() as conn:
-        await restore_tasks(bot=bot, conn=conn)
-        logger.debug("restore_tasks is running")
+    sender = OutboundSender(bot=bot, settings=config.sender)
+    sender.start()
+    reminder_scheduler.configure(config.reminders)
+    outbox = DeliveryWorker(db_pool=db_pool, sender=sender, settings=config.outbox)
+    outbox.start()
+    reminder_scheduler.start(fire=partial(send_reminder, outbox, db_pool))
+    # один процесс владеет всеми напоминаниями; ожидающие строки, как и в
+    # main.py, подхватывает диспетчер - отдельного восстановления нет
+    dispatcher = DueReminderDispatcher(
+        db_pool=db_pool, scheduler=reminder_scheduler, settings=config.reminders
+    )
+    dispatcher.start()
 
     logger.info("Including middlewares...")
-    dp.update.middleware(DataBaseMiddleware())
-    dp.update.middleware(ActivityCounterMiddleware())
+    dp.update.middleware(DataBaseMiddleware(db_pool=db_pool))
+    activity_buffer = ActivityBuffer(db_pool=db_pool, settings=config.activity)
+    activity_buffer.start()
+    dp.update.middleware(ActivityCounterMiddleware(buffer=activity_buffer))
 
    
 
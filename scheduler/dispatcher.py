@@ -0,0 +1,86 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from psycopg_pool import AsyncConnectionPool
+
+from config.config import ReminderSettings
+from scheduler.scheduler import ReminderScheduler
+from sql.todo_actions import claim_due_todos
+
+logger = logging.getLogger(__name__)
+
+
+# периодически забирает из БД строки, срок которых наступает в окне
+# lookahead, и передаёт их в локальный планировщик; несколько воркеров
+# делят строки между собой через FOR UPDATE SKIP LOCKED
+class DueReminderDispatcher:
+    def __init__(
+        self,
+        db_pool: AsyncConnectionPool,
+        scheduler: ReminderScheduler,
+        settings: ReminderSettings,
+    ) -> None:
+        self._db_pool = db_pool
+        self._scheduler = scheduler
+        self._poll_interval = settings.poll_interval
+        self._lookahead = timedelta(seconds=settings.lookahead)
+        self._lease = timedelta(seconds=settings.lease)
+        self._max_lateness = timedelta(seconds=settings.max_lateness)
+        self._batch_size = settings.batch_size
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run(), name="reminder-dispatcher")
+        logger.info(
+            "Reminder dispatcher started (poll every %ss, lookahead %s)",
+            self._poll_interval,
+            self._lookahead,
+        )
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        logger.info("Reminder dispatcher stopped")
+
+    async def poll_once(self) -> int:
+        # забираем только строки партиций этого узла
+        partitions, owned = self._scheduler.partitions
+        if not owned:
+            return 0
+        async with self._db_pool.connection() as conn:
+            async with conn.transaction():
+                rows = await claim_due_todos(
+                    conn,
+                    lookahead=self._lookahead,
+                    lease=self._lease,
+                    max_lateness=self._max_lateness,
+                    limit=self._batch_size,
+                    partitions=partitions,
+                    owned=sorted(owned),
+                )
+        for todo_id, user_id, todo, reminder_time in rows:
+            if todo_id in self._scheduler:
+                continue
+            self._scheduler.schedule(
+                todo_id, chat_id=user_id, todo=todo, reminder_time=reminder_time
+            )
+        return len(rows)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                # добираем окно пачками, пока БД отдаёт полные пачки
+                while await self.poll_once() >= self._batch_size:
+                    pass
+            except Exception as e:
+                logger.exception("Failed to poll due reminders: %s", e)
+            await asyncio.sleep(self._poll_interval)
@@ -0,0 +1,209 @@
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+import zlib
+from typing import Any, Awaitable, Callable
+
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+# (owned, lost) - текущие партиции узла и только что потерянные
+PartitionsCallback = Callable[[frozenset[int], frozenset[int]], Awaitable[Any]]
+
+# продлеваем и снимаем аренду, только если ключ всё ещё наш
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def partition_of(user_id: int, partitions: int) -> int:
+    # то же выражение, что mod(user_id, N) в запросах к todos
+    return user_id % partitions
+
+
+def partition_owner(partition: int, members: list[str]) -> str | None:
+    # rendezvous hashing: при входе или уходе узла переезжают только
+    # партиции этого узла
+    if not members:
+        return None
+    return max(
+        members,
+        key=lambda member: (zlib.crc32(f"{member}:{partition}".encode()), member),
+    )
+
+
+# узлы-планировщики делят partitions партиций напоминаний: каждый узел
+# отмечается в Redis (sorted set с временем истечения), по живым узлам
+# вычисляет свои партиции и держит на каждую аренду с TTL; партицию ушедшего
+# узла забирают остальные после истечения его аренды
+class PartitionMembership:
+    def __init__(
+        self,
+        redis: Redis,
+        *,
+        prefix: str,
+        partitions: int,
+        lease: float,
+        on_change: PartitionsCallback,
+        on_members: Callable[[int], Any] | None = None,
+    ) -> None:
+        self._redis = redis
+        self._prefix = prefix
+        self._partitions = partitions
+        self._lease = lease
+        self._lease_ms = int(lease * 1000)
+        self._interval = lease / 3
+        self._on_change = on_change
+        # число живых узлов: по нему узлы делят общие лимиты (OutboundSender)
+        self._on_members = on_members
+        self._token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex}"
+        self._renew = redis.register_script(RENEW_SCRIPT)
+        self._release = redis.register_script(RELEASE_SCRIPT)
+        self._owned: frozenset[int] = frozenset()
+        self._members: list[str] = []
+        # до этого момента аренды гарантированно наши, даже если Redis недоступен
+        self._valid_until = 0.0
+        self._task: asyncio.Task | None = None
+
+    @property
+    def partitions(self) -> int:
+        return self._partitions
+
+    @property
+    def owned(self) -> frozenset[int]:
+        return self._owned
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "node": self._token,
+            "partitions": self._partitions,
+            "owned": sorted(self._owned),
+            "members": len(self._members),
+        }
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run(), name="partition-membership")
+        logger.info(
+            "Joined %s as %s (%d partitions)",
+            self._prefix,
+            self._token,
+            self._partitions,
+        )
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        owned = self._owned
+        await self._apply(frozenset())
+        try:
+            for partition in owned:
+                await self._release(
+                    keys=[self._partition_key(partition)], args=[self._token]
+                )
+            await self._redis.zrem(self._members_key, self._token)
+        except Exception as e:
+            logger.warning("Failed to leave %s cleanly: %s", self._prefix, e)
+        logger.info("Left %s", self._prefix)
+
+    @property
+    def _members_key(self) -> str:
+        return f"{self._prefix}:members"
+
+    def _partition_key(self, partition: int) -> str:
+        return f"{self._prefix}:partition:{partition}"
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.rebalance()
+            except Exception as e:
+                logger.warning("Partition rebalance failed: %s", e)
+                # аренды могли истечь: отдаём партиции, пока их не взял другой
+                if time.monotonic() >= self._valid_until - self._interval:
+                    await self._apply(frozenset())
+            await asyncio.sleep(self._interval)
+
+    async def rebalance(self) -> frozenset[int]:
+        started_at = time.monotonic()
+        now = time.time()
+        async with self._redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(self._members_key, {self._token: now + self._lease})
+            pipe.zremrangebyscore(self._members_key, "-inf", now)
+            pipe.zrange(self._members_key, 0, -1)
+            *_, raw_members = await pipe.execute()
+        members = sorted(
+            member.decode() if isinstance(member, bytes) else member
+            for member in raw_members
+        )
+        if self._on_members is not None and len(members) != len(self._members):
+            self._on_members(len(members))
+        self._members = members
+        desired = {
+            partition
+            for partition in range(self._partitions)
+            if partition_owner(partition, self._members) == self._token
+        }
+
+        moving = self._owned - desired
+        if moving:
+            # партиция переехала на другой узел: сначала перестаём её
+            # обслуживать, затем сразу отдаём аренду
+            await self._apply(self._owned - moving)
+            for partition in moving:
+                await self._release(
+                    keys=[self._partition_key(partition)], args=[self._token]
+                )
+
+        owned: set[int] = set()
+        for partition in self._owned:
+            key = self._partition_key(partition)
+            if await self._renew(keys=[key], args=[self._token, self._lease_ms]):
+                owned.add(partition)
+        for partition in desired - self._owned:
+            key = self._partition_key(partition)
+            if await self._redis.set(key, self._token, nx=True, px=self._lease_ms):
+                owned.add(partition)
+
+        self._valid_until = started_at + self._lease
+        await self._apply(frozenset(owned))
+        return self._owned
+
+    async def _apply(self, owned: frozenset[int]) -> None:
+        if owned == self._owned:
+            return
+        lost = self._owned - owned
+        gained = owned - self._owned
+        self._owned = owned
+        logger.info(
+            "Partitions rebalanced: +%s -%s, owning %d of %d",
+            sorted(gained),
+            sorted(lost),
+            len(owned),
+            self._partitions,
+        )
+        try:
+            await self._on_change(owned, lost)
+        except Exception as e:
+            logger.exception("Partition change callback failed: %s", e)
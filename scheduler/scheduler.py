@@ -0,0 +1,214 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Hashable, Iterable
+
+from config.config import ReminderSettings
+from scheduler.partitions import partition_of
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(order=True, slots=True)
+class ScheduledReminder:
+    fire_at: float
+    seq: int
+    key: Hashable = field(compare=False)
+    chat_id: int = field(compare=False)
+    todo: str = field(compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+FireCallback = Callable[[ScheduledReminder], Awaitable[Any]]
+
+
+def fire_offset(key: Hashable, window: float) -> float:
+    # детерминированный сдвиг внутри окна: одно и то же напоминание
+    # сдвигается одинаково в любом процессе и после перезапуска
+    if window <= 0:
+        return 0.0
+    return zlib.crc32(str(key).encode()) / 0x100000000 * window
+
+
+# одна корутина-драйвер поверх min-heap по времени напоминания;
+# отменённые записи только помечаются и выбрасываются при извлечении.
+# Напоминания на одну минуту размазываются по fire_window секундам и
+# отдаются пачками по fire_batch с возвратом управления циклу между ними
+class ReminderScheduler:
+    def __init__(self, fire_window: float = 0.0, fire_batch: int = 100) -> None:
+        self._fire_window = fire_window
+        self._fire_batch = fire_batch
+        # по умолчанию (один узел) все напоминания свои
+        self._partitions = 1
+        self._owned: frozenset[int] = frozenset({0})
+        self._heap: list[ScheduledReminder] = []
+        self._entries: dict[Hashable, ScheduledReminder] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._driver: asyncio.Task | None = None
+        self._fire: FireCallback | None = None
+        self._inflight: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def configure(self, settings: ReminderSettings) -> None:
+        # уже запланированные записи сохраняют прежний сдвиг
+        self._fire_window = settings.fire_window
+        self._fire_batch = settings.fire_batch
+
+    @property
+    def partitions(self) -> tuple[int, frozenset[int]]:
+        return self._partitions, self._owned
+
+    def owns(self, user_id: int) -> bool:
+        return partition_of(user_id, self._partitions) in self._owned
+
+    def assign(self, partitions: int, owned: frozenset[int]) -> int:
+        # снимает записи партиций, которые теперь принадлежат другим узлам
+        self._partitions = partitions
+        self._owned = owned
+        foreign = [
+            key for key, entry in self._entries.items() if not self.owns(entry.chat_id)
+        ]
+        for key in foreign:
+            self._discard(key)
+        self._maybe_compact()
+        return len(foreign)
+
+    @property
+    def running(self) -> bool:
+        return self._driver is not None and not self._driver.done()
+
+    def start(self, fire: FireCallback) -> None:
+        if self.running:
+            return
+        self._fire = fire
+        self._driver = asyncio.create_task(self._run(), name="reminder-scheduler")
+        logger.info("Reminder scheduler started, %d reminders pending", len(self))
+
+    async def stop(self) -> None:
+        if self._driver is None:
+            return
+        self._driver.cancel()
+        try:
+            await self._driver
+        except asyncio.CancelledError:
+            pass
+        self._driver = None
+        logger.info("Reminder scheduler stopped")
+
+    def schedule(
+        self,
+        key: Hashable,
+        *,
+        chat_id: int,
+        todo: str,
+        reminder_time: datetime,
+    ) -> None:
+        self._discard(key)
+        entry = ScheduledReminder(
+            fire_at=reminder_time.timestamp() + fire_offset(key, self._fire_window),
+            seq=next(self._counter),
+            key=key,
+            chat_id=chat_id,
+            todo=todo,
+        )
+        self._entries[key] = entry
+        heapq.heappush(self._heap, entry)
+        if self._heap[0] is entry:
+            self._wakeup.set()
+
+    def cancel(self, key: Hashable) -> bool:
+        if not self._discard(key):
+            return False
+        self._maybe_compact()
+        return True
+
+    def cancel_many(self, keys: Iterable[Hashable]) -> int:
+        # одна чистка кучи на весь пакет отмен
+        cancelled = sum(1 for key in keys if self._discard(key))
+        if cancelled:
+            self._maybe_compact()
+        return cancelled
+
+    def reschedule(self, key: Hashable, reminder_time: datetime) -> bool:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        self.schedule(
+            key, chat_id=entry.chat_id, todo=entry.todo, reminder_time=reminder_time
+        )
+        return True
+
+    def _discard(self, key: Hashable) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        entry.cancelled = True
+        return True
+
+    def _maybe_compact(self) -> None:
+        # куча не должна расти за счёт "мёртвых" записей
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._entries):
+            self._heap = [entry for entry in self._heap if not entry.cancelled]
+            heapq.heapify(self._heap)
+
+    async def _run(self) -> None:
+        while True:
+            while self._heap and self._heap[0].cancelled:
+                heapq.heappop(self._heap)
+
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0].fire_at - time.time()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self._dispatch_batch()
+            # даём циклу обработать апдейты перед следующей пачкой
+            await asyncio.sleep(0)
+
+    def _dispatch_batch(self) -> None:
+        now = time.time()
+        dispatched = 0
+        while self._heap and dispatched < self._fire_batch:
+            entry = self._heap[0]
+            if not entry.cancelled and entry.fire_at > now:
+                break
+            heapq.heappop(self._heap)
+            if entry.cancelled:
+                continue
+            del self._entries[entry.key]
+            self._dispatch(entry)
+            dispatched += 1
+
+    def _dispatch(self, entry: ScheduledReminder) -> None:
+        task = asyncio.create_task(self._safe_fire(entry))
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _safe_fire(self, entry: ScheduledReminder) -> None:
+        try:
+            await self._fire(entry)
+        except Exception as e:
+            logger.exception("Failed to fire reminder %s: %s", entry.key, e)
+
+
+reminder_scheduler = ReminderScheduler()
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import random
+from datetime import timedelta
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from psycopg_pool import AsyncConnectionPool
+
+from config.config import OutboxSettings
+from sender.sender import OutboundSender
+from sql.delivery_actions import (
+    claim_deliveries,
+    extend_delivery_claims,
+    fail_deliveries,
+    mark_deliveries_sent,
+    retry_deliveries,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# разбирает outbox reminder_deliveries пачками: отправляет через
+# OutboundSender, сохраняет message_id отправленных, неудачные откладывает
+# с экспоненциальной задержкой, после max_attempts помечает failed
+class DeliveryWorker:
+    def __init__(
+        self,
+        db_pool: AsyncConnectionPool,
+        sender: OutboundSender,
+        settings: OutboxSettings,
+    ) -> None:
+        self._db_pool = db_pool
+        self._sender = sender
+        self._poll_interval = settings.poll_interval
+        self._batch_size = settings.batch_size
+        self._lease = timedelta(seconds=settings.lease)
+        self._max_attempts = settings.max_attempts
+        self._backoff_base = settings.backoff_base
+        self._backoff_max = settings.backoff_max
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="delivery-worker")
+        logger.info("Delivery worker started (poll every %ss)", self._poll_interval)
+
+    async def stop(self) -> None:
+        # новые пачки не захватываем, а текущую доводим до записи
+        # результатов: иначе отправленные строки останутся pending и после
+        # истечения аренды уйдут повторно. OutboundSender должен ещё работать
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(self._task), timeout=self._lease.total_seconds()
+            )
+        except asyncio.TimeoutError:
+            # отменённые отправки OutboundSender пропустит, а строки
+            # заберут повторно после истечения аренды
+            logger.warning("Delivery batch not finished, cancelling it")
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        logger.info("Delivery worker stopped")
+
+    def wake(self) -> None:
+        # в outbox появилась строка - не ждём следующего опроса
+        self._wakeup.set()
+
+    def backoff(self, attempts: int) -> float:
+        delay = min(self._backoff_max, self._backoff_base * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def run_once(self) -> int:
+        async with self._db_pool.connection() as conn:
+            async with conn.transaction():
+                rows = await claim_deliveries(
+                    conn, lease=self._lease, limit=self._batch_size
+                )
+        if not rows:
+            return 0
+
+        # id -> attempts ещё не отправленных строк: их захват продлевается,
+        # пока сообщения ждут в очереди OutboundSender (flood wait, длинная
+        # очередь), иначе другой воркер заберёт их повторно
+        unsent = {delivery_id: attempts for delivery_id, _, _, attempts in rows}
+
+        async def send(delivery_id: int, chat_id: int, text: str):
+            try:
+                return await self._sender.send(chat_id, text)
+            finally:
+                unsent.pop(delivery_id, None)
+
+        heartbeat = asyncio.create_task(self._extend_claims(unsent))
+        try:
+            results = await asyncio.gather(
+                *(
+                    send(delivery_id, chat_id, text)
+                    for delivery_id, chat_id, text, _ in rows
+                ),
+                return_exceptions=True,
+            )
+        finally:
+            heartbeat.cancel()
+            await asyncio.gather(heartbeat, return_exceptions=True)
+        sent: list[tuple[int, int]] = []
+        retry: list[tuple[int, int, float, str]] = []
+        failed: list[tuple[int, int, str]] = []
+        for (delivery_id, chat_id, _, attempts), result in zip(rows, results):
+            if isinstance(result, (TelegramForbiddenError, TelegramBadRequest)):
+                # бот заблокирован или чат недоступен - повтор не поможет
+                failed.append((delivery_id, attempts, str(result)))
+            elif result is None or isinstance(result, BaseException):
+                error = str(result) if result is not None else "not accepted"
+                if attempts >= self._max_attempts:
+                    failed.append((delivery_id, attempts, error))
+                else:
+                    retry.append(
+                        (delivery_id, attempts, self.backoff(attempts), error)
+                    )
+            else:
+                sent.append((delivery_id, result.message_id))
+
+        async with self._db_pool.connection() as conn:
+            async with conn.transaction():
+                await mark_deliveries_sent(conn, rows=sent)
+                await retry_deliveries(conn, rows=retry)
+                await fail_deliveries(conn, rows=failed)
+        logger.debug(
+            "Deliveries: %d sent, %d retried, %d failed",
+            len(sent),
+            len(retry),
+            len(failed),
+        )
+        return len(rows)
+
+    async def _extend_claims(self, unsent: dict[int, int]) -> None:
+        while True:
+            await asyncio.sleep(self._lease.total_seconds() / 3)
+            if not unsent:
+                return
+            rows = list(unsent.items())
+            try:
+                async with self._db_pool.connection() as conn:
+                    async with conn.transaction():
+                        extended = await extend_delivery_claims(
+                            conn, lease=self._lease, rows=rows
+                        )
+            except Exception as e:
+                logger.warning("Failed to extend delivery claims: %s", e)
+                continue
+            if extended < len(rows):
+                logger.warning(
+                    "%d delivery claims expired before sending",
+                    len(rows) - extended,
+                )
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                while (
+                    not self._stopping
+                    and await self.run_once() >= self._batch_size
+                ):
+                    pass
+            except Exception as e:
+                logger.exception("Failed to process reminder deliveries: %s", e)
+            if self._stopping:
+                return
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=self._poll_interval
+                )
+            except asyncio.TimeoutError:
+                pass
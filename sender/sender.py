@@ -0,0 +1,347 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramAPIError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+)
+from aiogram.types import Message
+
+from config.config import SenderSettings
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+# пустые корзины чатов удаляем, когда их становится больше этого числа
+CHAT_BUCKETS_PRUNE_AT = 10000
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+
+    def delay(self, now: float) -> float:
+        # через сколько секунд появится целый токен
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def consume(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+@dataclass(order=True, slots=True)
+class OutboundMessage:
+    priority: int
+    seq: int
+    chat_id: int = field(compare=False)
+    text: str = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+@dataclass
+class SenderStats:
+    accepted: int = 0
+    dropped: int = 0
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    latency_total: float = 0.0
+    latency_max: float = 0.0
+
+
+# исходящие сообщения бота: очередь с приоритетами, общий token bucket на
+# бота и по одному на чат, ограниченное число одновременных запросов;
+# на 429 отправка целиком встаёт на retry_after, сообщение повторяется
+class OutboundSender:
+    def __init__(self, bot: Bot, settings: SenderSettings) -> None:
+        self._bot = bot
+        self._chat_rate = settings.chat_rate
+        self._chat_burst = settings.chat_burst
+        self._queue_size = settings.queue_size
+        self._max_retries = settings.max_retries
+        self._drain_timeout = settings.drain_timeout
+        # global_rate - лимит на всего бота; воркер берёт свою долю
+        self._global_rate = settings.global_rate
+        self._workers = 1
+        self._global = TokenBucket(
+            settings.global_rate, settings.global_rate, time.monotonic()
+        )
+        self._chats: dict[int, TokenBucket] = {}
+        self._ready: list[OutboundMessage] = []
+        # (не раньше, seq, сообщение) - ждут токена своего чата или retry_after
+        self._delayed: list[tuple[float, int, OutboundMessage]] = []
+        self._paused_until = 0.0
+        self._counter = itertools.count()
+        self._slots = asyncio.Semaphore(settings.concurrency)
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._pending = 0
+        self._task: asyncio.Task | None = None
+        self._inflight: set[asyncio.Task] = set()
+        self.stats = SenderStats()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def set_workers(self, workers: int) -> None:
+        # у каждого воркера свой OutboundSender: общий лимит Telegram
+        # делится поровну между живыми воркерами
+        workers = max(1, workers)
+        if workers == self._workers:
+            return
+        self._workers = workers
+        rate = self._global_rate / workers
+        self._global.rate = rate
+        self._global.capacity = max(1.0, rate)
+        self._global.tokens = min(self._global.tokens, self._global.capacity)
+        logger.info(
+            "Outbound rate set to %.2f msg/s (%d workers share %s msg/s)",
+            rate,
+            workers,
+            self._global_rate,
+        )
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._run(), name="outbound-sender")
+        logger.info(
+            "Outbound sender started: %s msg/s global, %s msg/s per chat",
+            self._global.rate,
+            self._chat_rate,
+        )
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=self._drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Outbound queue not drained, %d messages dropped", self._pending
+            )
+        self._task.cancel()
+        for task in self._inflight:
+            task.cancel()
+        await asyncio.gather(self._task, *self._inflight, return_exceptions=True)
+        self._task = None
+        for message in self._ready:
+            self._finish(message, None)
+        for _, _, message in self._delayed:
+            self._finish(message, None)
+        self._ready.clear()
+        self._delayed.clear()
+        logger.info("Outbound sender stopped")
+
+    def submit(
+        self, chat_id: int, text: str, *, priority: int = PRIORITY_NORMAL
+    ) -> asyncio.Future | None:
+        if self._task is None:
+            self.stats.dropped += 1
+            logger.warning("Outbound sender is stopped, message to %d dropped", chat_id)
+            return None
+        if self._pending >= self._queue_size:
+            self.stats.dropped += 1
+            logger.warning("Outbound queue is full, message to %d dropped", chat_id)
+            return None
+        future = asyncio.get_running_loop().create_future()
+        message = OutboundMessage(
+            priority=priority,
+            seq=next(self._counter),
+            chat_id=chat_id,
+            text=text,
+            future=future,
+            enqueued_at=time.monotonic(),
+        )
+        heapq.heappush(self._ready, message)
+        self._pending += 1
+        self._idle.clear()
+        self.stats.accepted += 1
+        self._wakeup.set()
+        return future
+
+    async def send(
+        self, chat_id: int, text: str, *, priority: int = PRIORITY_NORMAL
+    ) -> Message | None:
+        # None - сообщение не принято (очередь переполнена или отправка
+        # остановлена); ошибка Telegram после всех повторов пробрасывается
+        future = self.submit(chat_id, text, priority=priority)
+        if future is None:
+            return None
+        return await future
+
+    def metrics(self) -> dict[str, float | int]:
+        stats = self.stats
+        return {
+            "queue_depth": self._pending,
+            "queue_size": self._queue_size,
+            "in_flight": len(self._inflight),
+            "chats": len(self._chats),
+            "workers": self._workers,
+            "global_rate": self._global.rate,
+            "accepted": stats.accepted,
+            "dropped": stats.dropped,
+            "sent": stats.sent,
+            "failed": stats.failed,
+            "retried": stats.retried,
+            "paused_for": max(0.0, self._paused_until - time.monotonic()),
+            "latency_avg": stats.latency_total / stats.sent if stats.sent else 0.0,
+            "latency_max": stats.latency_max,
+        }
+
+    def _chat_bucket(self, chat_id: int, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= CHAT_BUCKETS_PRUNE_AT:
+                self._chats = {
+                    key: value
+                    for key, value in self._chats.items()
+                    if not value.full(now)
+                }
+            bucket = TokenBucket(self._chat_rate, self._chat_burst, now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _defer(self, message: OutboundMessage, not_before: float) -> None:
+        heapq.heappush(self._delayed, (not_before, message.seq, message))
+
+    def _promote(self, now: float) -> None:
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, message = heapq.heappop(self._delayed)
+            heapq.heappush(self._ready, message)
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            self._promote(now)
+            if not self._ready:
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            if self._ready[0].future.cancelled():
+                # отправитель отменил ожидание (например, остановка outbox):
+                # сообщение не отправляем, его строку заберут повторно
+                self._finish(heapq.heappop(self._ready), None)
+                continue
+
+            wait = max(self._paused_until - now, self._global.delay(now))
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            message = heapq.heappop(self._ready)
+            bucket = self._chat_bucket(message.chat_id, now)
+            chat_wait = bucket.delay(now)
+            if chat_wait > 0:
+                self._defer(message, now + chat_wait)
+                continue
+
+            await self._slots.acquire()
+            now = time.monotonic()
+            self._global.consume(now)
+            bucket.consume(now)
+            task = asyncio.create_task(self._deliver(message))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _deliver(self, message: OutboundMessage) -> None:
+        if message.future.cancelled():
+            self._finish(message, None)
+            self._slots.release()
+            return
+        message.attempts += 1
+        try:
+            result = await self._bot.send_message(message.chat_id, message.text)
+        except TelegramRetryAfter as e:
+            # лимит превышен для всего бота: ставим на паузу всю отправку
+            self._paused_until = max(
+                self._paused_until, time.monotonic() + e.retry_after
+            )
+            logger.warning(
+                "Flood limit hit, pausing outbound messages for %ss", e.retry_after
+            )
+            self._retry(message, self._paused_until, e)
+        except TelegramNetworkError as e:
+            logger.warning("Network error while sending to %d: %s", message.chat_id, e)
+            self._retry(message, time.monotonic() + message.attempts, e)
+        except TelegramAPIError as e:
+            logger.warning("Message to %d rejected: %s", message.chat_id, e)
+            self.stats.failed += 1
+            self._finish(message, None, e)
+        except Exception as e:
+            logger.exception("Failed to send message to %d: %s", message.chat_id, e)
+            self.stats.failed += 1
+            self._finish(message, None, e)
+        else:
+            latency = time.monotonic() - message.enqueued_at
+            self.stats.sent += 1
+            self.stats.latency_total += latency
+            self.stats.latency_max = max(self.stats.latency_max, latency)
+            self._finish(message, result)
+        finally:
+            self._slots.release()
+
+    def _retry(
+        self, message: OutboundMessage, not_before: float, error: Exception
+    ) -> None:
+        if message.attempts > self._max_retries:
+            logger.error(
+                "Giving up on message to %d after %d attempts",
+                message.chat_id,
+                message.attempts,
+            )
+            self.stats.failed += 1
+            self._finish(message, None, error)
+            return
+        self.stats.retried += 1
+        self._defer(message, not_before)
+        self._wakeup.set()
+
+    def _finish(
+        self,
+        message: OutboundMessage,
+        result: Message | None,
+        error: Exception | None = None,
+    ) -> None:
+        if not message.future.done():
+            if error is not None:
+                message.future.set_exception(error)
+            else:
+                message.future.set_result(result)
+        self._pending -= 1
+        if not self._pending:
+            self._idle.set()
@@ -2,12 +2,91 @@ import logging
 from datetime import datetime, timezone
 from typing import Any
 
+from .queries import queries
 from .roles import UserRole
 from psycopg import AsyncConnection
 
 logger = logging.getLogger(__name__)
 
 
+ADD_USER = queries.register(
+    "add_user",
+    """
+        INSERT INTO users(user_id, username, language, role, is_alive)
+        VALUES(
+            %(user_id)s,
+            %(username)s,
+            %(language)s,
+            %(role)s,
+            %(is_alive)s
+        ) ON CONFLICT DO NOTHING;
+    """,
+)
+
+GET_USER = queries.register(
+    "get_user",
+    """
+        SELECT
+            id,
+            user_id,
+            username,
+            language,
+            role,
+            is_alive,
+            created_at,
+            timezone
+            FROM users WHERE user_id = %s;
+    """,
+)
+
+# счётчики приходят с минутной отметкой времени; день считается в БД
+# (timestamptz::date в часовом поясе сессии), как CURRENT_DATE в DEFAULT
+# колонки activity_date
+ADD_USER_ACTIVITY_BATCH = queries.register(
+    "add_user_activity_batch",
+    """
+        INSERT INTO activity (user_id, activity_date, actions)
+        SELECT a.user_id, a.seen_at::date, sum(a.actions)
+        FROM unnest(%s::bigint[], %s::timestamptz[], %s::int[])
+            AS a(user_id, seen_at, actions)
+        WHERE EXISTS (SELECT 1 FROM users u WHERE u.user_id = a.user_id)
+        GROUP BY a.user_id, a.seen_at::date
+        ON CONFLICT (user_id, activity_date)
+        DO UPDATE
+        SET actions = activity.actions + EXCLUDED.actions
+        RETURNING user_id;
+    """,
+)
+
+GET_STATISTICS = queries.register(
+    "get_statistics",
+    """
+        SELECT user_id, SUM(actions) AS total_actions
+        FROM activity
+        WHERE user_id = %s
+        GROUP BY user_id;
+    """,
+)
+
+SET_USER_TIMEZONE = queries.register(
+    "set_user_timezone",
+    """
+        UPDATE users
+        SET timezone = %s
+        WHERE user_id = %s;
+    """,
+)
+
+CHANGE_USER_ALIVE_STATUS = queries.register(
+    "change_user_alive_status",
+    """
+        UPDATE users
+        SET is_alive = %s
+        WHERE user_id = %s;
+    """,
+)
+
+
 async def add_user(
     conn: AsyncConnection,
     *,
@@ -18,19 +97,10 @@ async def add_user(
     is_alive: bool = True,
 ) -> None:
     async with conn.cursor() as cursor:
-        await cursor.execute(
-            query="""
-                INSERT INTO users(user_id, username, language, role, is_alive)
-                VALUES(
-                    %(user_id)s, 
-                    %(username)s, 
-                    %(language)s, 
-                    %(role)s, 
-                    %(is_alive)s 
-                    
-                ) ON CONFLICT DO NOTHING;
-            """,
-            params={
+        await queries.execute(
+            cursor,
+            ADD_USER,
+            {
                 "user_id": user_id,
                 "username": username,
                 "language": language,
@@ -56,55 +126,41 @@ async def get_user(
     user_id: int,
 ) -> tuple[Any, ...] | None:
     async with conn.cursor() as cursor:
-        data = await cursor.execute(
-            query="""
-                SELECT 
-                    id,
-                    user_id,
-                    username,
-                    language,
-                    role,
-                    is_alive,
-                    created_at
-                    FROM users WHERE user_id = %s;
-            """,
-            params=(user_id,),
-        )
+        data = await queries.execute(cursor, GET_USER, (user_id,))
         row = await data.fetchone()
     logger.info("Row is %s", row)
     return row if row else None
 
 
-async def add_user_activity(
+async def add_user_activity_batch(
     conn: AsyncConnection,
     *,
-    user_id: int,
+    rows: list[tuple[int, datetime, int]],
 ) -> None:
+    if not rows:
+        return
+    user_ids, seen_at, actions = zip(*rows)
     async with conn.cursor() as cursor:
-        await cursor.execute(
-            query="""
-                INSERT INTO activity (user_id)
-                VALUES (%s)
-                ON CONFLICT (user_id, activity_date)
-                DO UPDATE
-                SET actions = activity.actions + 1;
-            """,
-            params=(user_id,),
+        data = await queries.execute(
+            cursor,
+            ADD_USER_ACTIVITY_BATCH,
+            (list(user_ids), list(seen_at), list(actions)),
         )
-    logger.info("User activity updated. table=`activity`, user_id=%d", user_id)
+        stored = {row[0] for row in await data.fetchall()}
+    # активность пользователей, которых нет в users, отбрасывается
+    dropped = [row for row in rows if row[0] not in stored]
+    if dropped:
+        logger.warning(
+            "Dropped activity of %d unknown users (%d actions)",
+            len({row[0] for row in dropped}),
+            sum(row[2] for row in dropped),
+        )
+    logger.info("User activity flushed. table=`activity`, rows=%d", len(rows))
 
 
 async def get_statistics(conn: AsyncConnection, user_id: int):
     async with conn.cursor() as cursor:
-        data = await cursor.execute(
-            query="""
-                SELECT user_id, SUM(actions) AS total_actions
-                FROM activity
-                WHERE user_id = %s
-                GROUP BY user_id;
-            """,
-            params=(user_id,),
-        )
+        data = await queries.execute(cursor, GET_STATISTICS, (user_id,))
         rows = await data.fetchall()
     logger.info("Users activity got from table=`activity`")
     return [*rows] if rows else 0
@@ -117,12 +173,21 @@ async def change_user_alive_status(
     user_id: int,
 ) -> None:
     async with conn.cursor() as cursor:
-        await cursor.execute(
-            query="""
-                UPDATE users
-                SET is_alive = %s
-                WHERE user_id = %s;
-            """,
-            params=(is_alive, user_id),
-        )
+        await queries.execute(cursor, CHANGE_USER_ALIVE_STATUS, (is_alive, user_id))
     logger.info("Updated `is_alive` status to `%s` for user %d", is_alive, user_id)
+
+
+async def set_user_timezone(
+    conn: AsyncConnection,
+    *,
+    user_id: int,
+    user_timezone: str,
+) -> bool:
+    async with conn.cursor() as cursor:
+        await queries.execute(cursor, SET_USER_TIMEZONE, (user_timezone, user_id))
+        updated = cursor.rowcount > 0
+    if updated:
+        logger.info("Updated `timezone` to `%s` for user %d", user_timezone, user_id)
+    else:
+        logger.warning("User %d not found while setting timezone", user_id)
+    return updated
@@ -1,4 +1,5 @@
 import logging
+from typing import Any, Awaitable, Callable
 from urllib.parse import quote
 
 from psycopg import AsyncConnection
@@ -93,3 +94,15 @@ async def get_pg_pool(
         if db_pool and not db_pool.closed:
             await db_pool.close()
         raise
+
+
+# колбэк после фиксации текущей транзакции: LazyConnection откладывает его
+# до своего release(), с обычным соединением он выполняется сразу
+async def after_commit(
+    conn: AsyncConnection, callback: Callable[[], Awaitable[Any]]
+) -> None:
+    register = getattr(conn, "after_commit", None)
+    if register is None:
+        await callback()
+    else:
+        register(callback)
@@ -0,0 +1,180 @@
+import logging
+from datetime import timedelta
+from typing import Any
+
+from .queries import queries
+from psycopg import AsyncConnection
+
+logger = logging.getLogger(__name__)
+
+
+# строка todos помечается доставленной и одновременно попадает в outbox;
+# повторная постановка того же напоминания упирается в idempotency_key
+ENQUEUE_REMINDER_DELIVERY = queries.register(
+    "enqueue_reminder_delivery",
+    """
+        WITH due AS (
+            UPDATE todos
+            SET delivered_at = now()
+            WHERE id = %(todo_id)s AND NOT done AND delivered_at IS NULL
+            RETURNING id, user_id
+        )
+        INSERT INTO reminder_deliveries (todo_id, chat_id, text, idempotency_key)
+        SELECT id, user_id, %(text)s, 'reminder:' || id
+        FROM due
+        ON CONFLICT (idempotency_key) DO NOTHING
+        RETURNING id;
+    """,
+)
+
+CLAIM_DELIVERIES = queries.register(
+    "claim_deliveries",
+    """
+        UPDATE reminder_deliveries
+        SET claimed_until = now() + %(lease)s,
+            attempts = attempts + 1
+        WHERE id IN (
+            SELECT id
+            FROM reminder_deliveries
+            WHERE status = 'pending'
+              AND next_attempt_at <= now()
+              AND (claimed_until IS NULL OR claimed_until < now())
+            ORDER BY next_attempt_at
+            LIMIT %(limit)s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, chat_id, text, attempts;
+    """,
+)
+
+# attempts увеличивается при каждом захвате, поэтому пара (id, attempts)
+# определяет захват: продлить или записать результат может только он
+EXTEND_DELIVERY_CLAIMS = queries.register(
+    "extend_delivery_claims",
+    """
+        UPDATE reminder_deliveries d
+        SET claimed_until = now() + %s
+        FROM unnest(%s::bigint[], %s::int[]) AS c(id, attempts)
+        WHERE d.id = c.id
+          AND d.attempts = c.attempts
+          AND d.status = 'pending';
+    """,
+)
+
+MARK_DELIVERIES_SENT = queries.register(
+    "mark_deliveries_sent",
+    """
+        UPDATE reminder_deliveries d
+        SET status = 'sent',
+            message_id = s.message_id,
+            sent_at = now(),
+            claimed_until = NULL,
+            last_error = NULL
+        FROM unnest(%s::bigint[], %s::bigint[]) AS s(id, message_id)
+        WHERE d.id = s.id;
+    """,
+)
+
+RETRY_DELIVERIES = queries.register(
+    "retry_deliveries",
+    """
+        UPDATE reminder_deliveries d
+        SET next_attempt_at = now() + s.delay * interval '1 second',
+            claimed_until = NULL,
+            last_error = s.error
+        FROM unnest(%s::bigint[], %s::int[], %s::float8[], %s::text[])
+            AS s(id, attempts, delay, error)
+        WHERE d.id = s.id AND d.attempts = s.attempts;
+    """,
+)
+
+FAIL_DELIVERIES = queries.register(
+    "fail_deliveries",
+    """
+        UPDATE reminder_deliveries d
+        SET status = 'failed',
+            claimed_until = NULL,
+            last_error = s.error
+        FROM unnest(%s::bigint[], %s::int[], %s::text[]) AS s(id, attempts, error)
+        WHERE d.id = s.id AND d.attempts = s.attempts;
+    """,
+)
+
+
+async def enqueue_reminder_delivery(
+    conn: AsyncConnection, *, todo_id: int, text: str
+) -> int | None:
+    async with conn.cursor() as cursor:
+        data = await queries.execute(
+            cursor, ENQUEUE_REMINDER_DELIVERY, {"todo_id": todo_id, "text": text}
+        )
+        row = await data.fetchone()
+    return row[0] if row else None
+
+
+async def claim_deliveries(
+    conn: AsyncConnection, *, lease: timedelta, limit: int
+) -> list[tuple[Any, ...]]:
+    # как и claim_due_todos: чужие строки пропускаются (SKIP LOCKED), а
+    # claimed_until не даёт забрать их повторно, пока идёт отправка
+    async with conn.cursor() as cursor:
+        data = await queries.execute(
+            cursor, CLAIM_DELIVERIES, {"lease": lease, "limit": limit}
+        )
+        rows = await data.fetchall()
+    logger.debug("Claimed %d reminder deliveries", len(rows))
+    return rows
+
+
+async def extend_delivery_claims(
+    conn: AsyncConnection, *, lease: timedelta, rows: list[tuple[int, int]]
+) -> int:
+    # rows - (id, attempts) ещё не отправленных строк; возвращает число
+    # продлённых, меньше len(rows) - часть захватов уже перехвачена
+    if not rows:
+        return 0
+    ids, attempts = zip(*rows)
+    async with conn.cursor() as cursor:
+        await queries.execute(
+            cursor, EXTEND_DELIVERY_CLAIMS, (lease, list(ids), list(attempts))
+        )
+        return cursor.rowcount
+
+
+async def mark_deliveries_sent(
+    conn: AsyncConnection, *, rows: list[tuple[int, int]]
+) -> None:
+    if not rows:
+        return
+    ids, message_ids = zip(*rows)
+    async with conn.cursor() as cursor:
+        await queries.execute(
+            cursor, MARK_DELIVERIES_SENT, (list(ids), list(message_ids))
+        )
+
+
+async def retry_deliveries(
+    conn: AsyncConnection, *, rows: list[tuple[int, int, float, str]]
+) -> None:
+    if not rows:
+        return
+    ids, attempts, delays, errors = zip(*rows)
+    async with conn.cursor() as cursor:
+        await queries.execute(
+            cursor,
+            RETRY_DELIVERIES,
+            (list(ids), list(attempts), list(delays), list(errors)),
+        )
+
+
+async def fail_deliveries(
+    conn: AsyncConnection, *, rows: list[tuple[int, int, str]]
+) -> None:
+    if not rows:
+        return
+    ids, attempts, errors = zip(*rows)
+    async with conn.cursor() as cursor:
+        await queries.execute(
+            cursor, FAIL_DELIVERIES, (list(ids), list(attempts), list(errors))
+        )
+    logger.warning("%d reminder deliveries failed permanently", len(rows))
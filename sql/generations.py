@@ -0,0 +1,51 @@
+import logging
+
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+# ключ поколения должен жить дольше любой записи L1, иначе после его
+# истечения счётчик вернётся к 0 и совпадёт с поколением старой записи
+GENERATION_TTL = 86400
+
+
+# поколение данных пользователя в Redis, общее для всех воркеров: запись в
+# БД увеличивает его, а кэш процесса доверяет своей копии, только если её
+# поколение совпадает с текущим. Без Redis (один процесс) поколение всегда 0
+class UserGenerations:
+    def __init__(self, prefix: str) -> None:
+        self._prefix = prefix
+        self._redis: Redis | None = None
+
+    def configure(self, redis: Redis | None) -> None:
+        self._redis = redis
+
+    async def get(self, user_id: int) -> int | None:
+        # None - поколение неизвестно (Redis недоступен): кэшу верить нельзя
+        if self._redis is None:
+            return 0
+        try:
+            raw = await self._redis.get(self._key(user_id))
+        except Exception as e:
+            logger.warning(
+                "Failed to read %s generation of user %d: %s", self._prefix, user_id, e
+            )
+            return None
+        return int(raw) if raw is not None else 0
+
+    async def bump(self, user_id: int) -> None:
+        if self._redis is None:
+            return
+        key = self._key(user_id)
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.incr(key)
+                pipe.expire(key, GENERATION_TTL)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(
+                "Failed to bump %s generation of user %d: %s", self._prefix, user_id, e
+            )
+
+    def _key(self, user_id: int) -> str:
+        return f"{self._prefix}:gen:{user_id}"
@@ -0,0 +1,294 @@
+import asyncio
+import logging
+import os
+import sys
+from dataclasses import dataclass
+
+from .connection import get_pg_connection
+from config.config import Config, load_config
+from psycopg import AsyncConnection, Error
+
+logger = logging.getLogger(__name__)
+
+# произвольный ключ advisory lock: миграции одновременно запускает только
+# один процесс, остальные ждут и затем видят уже применённые версии
+MIGRATIONS_LOCK_KEY = 7_305_519_001
+MIGRATIONS_LOCK_POLL = 1.0
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    statements: tuple[str, ...]
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    transactional: bool = True
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    Migration(
+        version=1,
+        name="create users and activity",
+        statements=(
+            """
+            CREATE TABLE IF NOT EXISTS users(
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT NOT NULL UNIQUE,
+                username VARCHAR(50),
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                language VARCHAR(10) NOT NULL,
+                role VARCHAR(30) NOT NULL,
+                is_alive BOOLEAN NOT NULL
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS activity(
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT REFERENCES users(user_id),
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                activity_date DATE NOT NULL DEFAULT CURRENT_DATE,
+                actions INT NOT NULL DEFAULT 1
+            );
+            """,
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_activity_user_day
+            ON activity (user_id, activity_date);
+            """,
+        ),
+    ),
+    Migration(
+        version=2,
+        name="create todos and habits",
+        statements=(
+            """
+            CREATE TABLE IF NOT EXISTS todos(
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT REFERENCES users(user_id),
+                username VARCHAR(50),
+                time_of_creation TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                todo VARCHAR(50),
+                done BOOLEAN NOT NULL,
+                reminder_time TIMESTAMPTZ NOT NULL
+            );
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS habits(
+                id SERIAL PRIMARY KEY,
+                user_id BIGINT REFERENCES users(user_id),
+                time_of_creation TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                habit VARCHAR(50),
+                frequency VARCHAR(30)
+            );
+            """,
+        ),
+    ),
+    Migration(
+        version=3,
+        name="todos timezone and delivery columns",
+        statements=(
+            "ALTER TABLE todos ADD COLUMN IF NOT EXISTS timezone VARCHAR(50);",
+            "ALTER TABLE todos ADD COLUMN IF NOT EXISTS delivered_at TIMESTAMPTZ;",
+            "ALTER TABLE todos ADD COLUMN IF NOT EXISTS claimed_until TIMESTAMPTZ;",
+        ),
+    ),
+    Migration(
+        version=4,
+        name="todos (user_id, reminder_time, id) index",
+        statements=(
+            "DROP INDEX CONCURRENTLY IF EXISTS idx_todos_user_reminder;",
+            """
+            CREATE INDEX CONCURRENTLY idx_todos_user_reminder
+            ON todos (user_id, reminder_time, id);
+            """,
+        ),
+        transactional=False,
+    ),
+    Migration(
+        version=5,
+        name="todos (user_id, todo) index",
+        statements=(
+            "DROP INDEX CONCURRENTLY IF EXISTS idx_todos_user_todo;",
+            """
+            CREATE INDEX CONCURRENTLY idx_todos_user_todo
+            ON todos (user_id, todo);
+            """,
+        ),
+        transactional=False,
+    ),
+    Migration(
+        version=6,
+        name="todos pending reminders partial index",
+        statements=(
+            "DROP INDEX CONCURRENTLY IF EXISTS idx_todos_pending_reminder;",
+            """
+            CREATE INDEX CONCURRENTLY idx_todos_pending_reminder
+            ON todos (reminder_time)
+            WHERE NOT done AND delivered_at IS NULL;
+            """,
+        ),
+        transactional=False,
+    ),
+    Migration(
+        version=7,
+        name="users timezone column",
+        statements=(
+            "ALTER TABLE users ADD COLUMN IF NOT EXISTS timezone VARCHAR(50);",
+        ),
+    ),
+    Migration(
+        version=8,
+        name="reminder deliveries outbox",
+        statements=(
+            """
+            CREATE TABLE IF NOT EXISTS reminder_deliveries(
+                id BIGSERIAL PRIMARY KEY,
+                todo_id INT NOT NULL REFERENCES todos(id) ON DELETE CASCADE,
+                chat_id BIGINT NOT NULL,
+                text TEXT NOT NULL,
+                idempotency_key VARCHAR(100) NOT NULL UNIQUE,
+                status VARCHAR(20) NOT NULL DEFAULT 'pending',
+                attempts INT NOT NULL DEFAULT 0,
+                next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                claimed_until TIMESTAMPTZ,
+                message_id BIGINT,
+                last_error TEXT,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                sent_at TIMESTAMPTZ
+            );
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_reminder_deliveries_pending
+            ON reminder_deliveries (next_attempt_at)
+            WHERE status = 'pending';
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS idx_reminder_deliveries_todo
+            ON reminder_deliveries (todo_id);
+            """,
+        ),
+    ),
+    Migration(
+        version=9,
+        name="drop todos (user_id, todo) index",
+        # напоминания ищутся по первичному ключу, индекс по тексту не нужен
+        statements=("DROP INDEX CONCURRENTLY IF EXISTS idx_todos_user_todo;",),
+        transactional=False,
+    ),
+)
+
+
+async def _applied_versions(conn: AsyncConnection) -> set[int]:
+    async with conn.cursor() as cursor:
+        await cursor.execute(
+            query="""
+                CREATE TABLE IF NOT EXISTS schema_migrations(
+                    version INT PRIMARY KEY,
+                    name VARCHAR(100) NOT NULL,
+                    applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+            """
+        )
+        data = await cursor.execute("SELECT version FROM schema_migrations;")
+        rows = await data.fetchall()
+    return {row[0] for row in rows}
+
+
+async def _apply(conn: AsyncConnection, migration: Migration) -> None:
+    async with conn.cursor() as cursor:
+        for statement in migration.statements:
+            await cursor.execute(statement)
+        await cursor.execute(
+            query="""
+                INSERT INTO schema_migrations (version, name)
+                VALUES (%s, %s)
+                ON CONFLICT DO NOTHING;
+            """,
+            params=(migration.version, migration.name),
+        )
+
+
+async def _acquire_lock(conn: AsyncConnection) -> None:
+    # не pg_advisory_lock: ожидающий в нём запрос держит снимок, а
+    # CREATE INDEX CONCURRENTLY у владельца блокировки ждёт снимков всех
+    # сессий - при одновременном старте воркеров это взаимоблокировка.
+    # Поэтому опрашиваем pg_try_advisory_lock без открытого выражения
+    while True:
+        async with conn.cursor() as cursor:
+            data = await cursor.execute(
+                "SELECT pg_try_advisory_lock(%s);", (MIGRATIONS_LOCK_KEY,)
+            )
+            row = await data.fetchone()
+        if row[0]:
+            return
+        logger.info("Migrations are applied by another process, waiting")
+        await asyncio.sleep(MIGRATIONS_LOCK_POLL)
+
+
+async def run_migrations(conn: AsyncConnection) -> list[int]:
+    # ожидается соединение в режиме autocommit
+    applied: list[int] = []
+    await _acquire_lock(conn)
+    try:
+        done = await _applied_versions(conn)
+        for migration in MIGRATIONS:
+            if migration.version in done:
+                continue
+            logger.info(
+                "Applying migration %d: %s", migration.version, migration.name
+            )
+            if migration.transactional:
+                async with conn.transaction():
+                    await _apply(conn, migration)
+            else:
+                await _apply(conn, migration)
+            applied.append(migration.version)
+    finally:
+        async with conn.cursor() as cursor:
+            await cursor.execute(
+                "SELECT pg_advisory_unlock(%s);", (MIGRATIONS_LOCK_KEY,)
+            )
+    if applied:
+        logger.info("Applied migrations: %s", applied)
+    else:
+        logger.info("Database schema is up to date")
+    return applied
+
+
+async def migrate(
+    db_name: str,
+    host: str,
+    port: int,
+    user: str,
+    password: str,
+) -> list[int]:
+    connection = await get_pg_connection(db_name, host, port, user, password)
+    async with connection:
+        await connection.set_autocommit(True)
+        return await run_migrations(connection)
+
+
+async def main():
+    config: Config = load_config()
+    logging.basicConfig(
+        level=config.log.level,
+        format=config.log.format,
+    )
+
+    try:
+        await migrate(
+            db_name=config.db.name,
+            host=config.db.host,
+            port=config.db.port,
+            user=config.db.user,
+            password=config.db.password,
+        )
+    except Error as db_error:
+        logger.exception("Database-specific error: %s", db_error)
+    except Exception as e:
+        logger.exception("Unhandled error: %s", e)
+
+
+if __name__ == "__main__":
+    if sys.platform.startswith("win") or os.name == "nt":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(main())
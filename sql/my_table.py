@@ -1,74 +0,0 @@
-import asyncio
-import logging
-import os
-import sys
-
-from .connection import get_pg_connection
-from config.config import Config, load_config
-from psycopg import AsyncConnection, Error
-
-config: Config = load_config()
-
-logging.basicConfig(
-    level=config.log.level,
-    format=config.log.format,
-)
-
-logger = logging.getLogger(__name__)
-
-if sys.platform.startswith("win") or os.name == "nt":
-    asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-
-
-async def main():
-    connection: AsyncConnection | None = None
-
-    try:
-        connection = await get_pg_connection(
-            db_name=config.db.name,
-            host=config.db.host,
-            port=config.db.port,
-            user=config.db.user,
-            password=config.db.password,
-        )
-        async with connection:
-            async with connection.transaction():
-                async with connection.cursor() as cursor:
-                    await cursor.execute(
-                        query="""
-                            CREATE TABLE IF NOT EXISTS todos(
-                                id SERIAL PRIMARY KEY,
-                                user_id BIGINT REFERENCES users(user_id),
-                                username VARCHAR(50),
-                                time_of_creation TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                                todo VARCHAR(50),
-                                done BOOLEAN NOT NULL,
-                                reminder_time TIMESTAMPTZ NOT NULL
-
-                            ); 
-                        """
-                    )
-                    await cursor.execute(
-                        query="""
-                            CREATE TABLE IF NOT EXISTS habits(
-                                id SERIAL PRIMARY KEY,
-                                user_id BIGINT REFERENCES users(user_id),
-                                time_of_creation TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                                habit VARCHAR(50),
-                                frequency VARCHAR(30)
-                            );
-                            
-                        """
-                    )
-                logger.info("Tables `todos` and `habits` were successfully created")
-    except Error as db_error:
-        logger.exception("Database-specific error: %s", db_error)
-    except Exception as e:
-        logger.exception("Unhandled error: %s", e)
-    finally:
-        if connection:
-            await connection.close()
-            logger.info("Connection to Postgres closed")
-
-
-asyncio.run(main())
@@ -0,0 +1,82 @@
+import bisect
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any
+
+from psycopg import AsyncCursor
+
+logger = logging.getLogger(__name__)
+
+# границы корзин гистограммы времени выполнения, в миллисекундах
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+@dataclass(frozen=True)
+class Query:
+    name: str
+    sql: str
+    # серверные (именованные) курсоры подготовить нельзя
+    prepare: bool = True
+
+
+@dataclass
+class QueryTimings:
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    buckets: list[int] = field(default_factory=lambda: [0] * (len(BUCKETS_MS) + 1))
+
+    def observe(self, elapsed_ms: float) -> None:
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.buckets[bisect.bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+
+
+# все SQL-запросы объявляются один раз и выполняются как серверные
+# prepared statements; psycopg держит кэш подготовленных запросов на каждом
+# соединении, поэтому пересоздание соединений пулом безопасно
+class QueryRegistry:
+    def __init__(self) -> None:
+        self._queries: dict[str, Query] = {}
+        self._timings: dict[str, QueryTimings] = {}
+
+    def register(self, name: str, sql: str, *, prepare: bool = True) -> Query:
+        if name in self._queries:
+            raise ValueError(f"Query {name!r} is already registered")
+        query = Query(name=name, sql=sql, prepare=prepare)
+        self._queries[name] = query
+        self._timings[name] = QueryTimings()
+        return query
+
+    def __getitem__(self, name: str) -> Query:
+        return self._queries[name]
+
+    async def execute(
+        self, cursor: AsyncCursor, query: Query, params: Any = None
+    ) -> AsyncCursor:
+        started_at = time.perf_counter()
+        try:
+            if query.prepare:
+                return await cursor.execute(query.sql, params, prepare=True)
+            return await cursor.execute(query.sql, params)
+        finally:
+            elapsed_ms = (time.perf_counter() - started_at) * 1000
+            self._timings[query.name].observe(elapsed_ms)
+
+    def stats(self) -> dict[str, dict[str, Any]]:
+        return {
+            name: {
+                "count": timings.count,
+                "avg_ms": timings.total_ms / timings.count if timings.count else 0.0,
+                "max_ms": timings.max_ms,
+                "histogram": dict(
+                    zip([f"<={b}ms" for b in BUCKETS_MS] + ["inf"], timings.buckets)
+                ),
+            }
+            for name, timings in self._timings.items()
+        }
+
+
+queries = QueryRegistry()
@@ -1,10 +1,12 @@
 from config.config import Config, load_config
 import math
 import logging
-from datetime import datetime, timezone
-from typing import Any
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Sequence
+from .queries import queries
 from .roles import UserRole
-from psycopg import AsyncConnection
+from psycopg import AsyncConnection, AsyncCursor
 
 config: Config = load_config()
 
@@ -16,6 +18,116 @@ logging.basicConfig(
 )
 
 
+ADD_TODO = queries.register(
+    "add_todo",
+    """
+        INSERT INTO todos (user_id,username,todo,done,reminder_time,timezone)
+        VALUES (
+        %(user_id)s,
+        %(username)s,
+        %(todo)s,
+        %(done)s,
+        %(reminder_time)s,
+        %(timezone)s
+        )
+        ON CONFLICT DO NOTHING
+        RETURNING id;
+    """,
+)
+
+CHANGE_TODO_STATUS = queries.register(
+    "change_todo_status",
+    """
+        UPDATE todos
+        SET done = %s
+        WHERE id = %s AND user_id = %s
+        RETURNING id;
+    """,
+)
+
+REMOVE_TODO = queries.register(
+    "remove_todo",
+    """
+        DELETE FROM todos
+        WHERE id = %s AND user_id = %s
+        RETURNING id;
+    """,
+)
+
+# массовые операции: одно выражение на весь выбор вместо запроса на строку
+SET_TODOS_STATUS = queries.register(
+    "set_todos_status",
+    """
+        UPDATE todos
+        SET done = %s
+        WHERE user_id = %s AND id = ANY(%s) AND done <> %s
+        RETURNING id;
+    """,
+)
+
+REMOVE_TODOS = queries.register(
+    "remove_todos",
+    """
+        DELETE FROM todos
+        WHERE user_id = %s AND id = ANY(%s)
+        RETURNING id;
+    """,
+)
+
+COMPLETE_PAST_TODOS = queries.register(
+    "complete_past_todos",
+    """
+        UPDATE todos
+        SET done = TRUE
+        WHERE user_id = %s AND NOT done AND reminder_time <= now()
+        RETURNING id;
+    """,
+)
+
+REMOVE_DONE_TODOS = queries.register(
+    "remove_done_todos",
+    """
+        DELETE FROM todos
+        WHERE user_id = %s AND done
+        RETURNING id;
+    """,
+)
+
+CLAIM_DUE_TODOS = queries.register(
+    "claim_due_todos",
+    """
+        UPDATE todos
+        SET claimed_until = GREATEST(reminder_time, now()) + %(lease)s
+        WHERE id IN (
+            SELECT id
+            FROM todos
+            WHERE NOT done
+              AND delivered_at IS NULL
+              AND reminder_time <= now() + %(lookahead)s
+              AND reminder_time > now() - %(max_lateness)s
+              AND (claimed_until IS NULL OR claimed_until < now())
+              AND mod(user_id, %(partitions)s) = ANY(%(owned)s)
+            ORDER BY reminder_time
+            LIMIT %(limit)s
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, user_id, todo, reminder_time;
+    """,
+)
+
+RELEASE_PARTITION_CLAIMS = queries.register(
+    "release_partition_claims",
+    """
+        UPDATE todos
+        SET claimed_until = NULL
+        WHERE NOT done
+          AND delivered_at IS NULL
+          AND claimed_until > now()
+          AND mod(user_id, %(partitions)s) = ANY(%(lost)s);
+    """,
+)
+
+
 async def add_todo(
     conn: AsyncConnection,
     *,
@@ -25,22 +137,12 @@ async def add_todo(
     done: bool,
     reminder_time: datetime,
     user_timezone: str,
-) -> None:
+) -> int | None:
     async with conn.cursor() as cursor:
-        await cursor.execute(
-            query="""
-                INSERT INTO todos (user_id,username,todo,done,reminder_time,timezone)
-                VALUES (
-                %(user_id)s,
-                %(username)s,
-                %(todo)s,
-                %(done)s,
-                %(reminder_time)s,
-                %(timezone)s
-                )
-                ON CONFLICT DO NOTHING;
-            """,
-            params={
+        data = await queries.execute(
+            cursor,
+            ADD_TODO,
+            {
                 "user_id": user_id,
                 "username": username,
                 "todo": todo,
@@ -49,101 +151,272 @@ async def add_todo(
                 "timezone": user_timezone,
             },
         )
-    rowcount = cursor.rowcount
-    if rowcount:
+        row = await data.fetchone()
+    if row:
         logger.info("INSERTED DATA INTO TABLE TODOS")
-    else:
-        logger.warning("ERROR WHILE INSERTING INTO TODOS TABLE")
+        return row[0]
+    logger.warning("ERROR WHILE INSERTING INTO TODOS TABLE")
+    return None
 
 
-async def get_todo_list(
-    conn: AsyncConnection, *, user_id: int, page: int
-) -> list[tuple[Any, ...]] | None:
-    async with conn.cursor() as cursor:
-        page = max(page, 1)
+PAGE_SIZE = 5
 
-        total_rows = await cursor.execute(
-            "SELECT COUNT(*) FROM todos WHERE user_id = %s", params=(user_id,)
-        )
-        total_rows = (await total_rows.fetchone())[0]
-        page_size = 5
-        offset = (page - 1) * page_size
-        if offset >= total_rows:
-            return []
-        limit = min(page_size, total_rows - offset)
-
-        data = await cursor.execute(
-            query="""
-                SELECT todo, reminder_time,done,timezone
-                FROM todos
-                WHERE user_id = %s
-                ORDER BY reminder_time
-                LIMIT %s OFFSET %s
-            """,
-            params=(user_id, limit, offset),
-        )
+TodoCursor = tuple[datetime, int]
 
-        row = await data.fetchall()
-    logger.info("Row is %s", row)
-    return row if row else []
 
+@dataclass(frozen=True, slots=True)
+class Todo:
+    id: int
+    todo: str
+    reminder_time: datetime
+    done: bool
+    timezone: str | None
 
-async def get_total_pages(conn: AsyncConnection, *, user_id: int) -> int | None:
-    async with conn.cursor() as cursor:
-        page_size = 10
+    @property
+    def cursor(self) -> TodoCursor:
+        return self.reminder_time, self.id
 
-        await cursor.execute(
-            query="""
-            SELECT COUNT(*) FROM todos WHERE user_id = %s
-            """,
-            params=(user_id,),
+    # компактная запись: позиционный список вместо словаря, время - unix
+    # timestamp (дробный, чтобы курсор страницы совпадал с БД до микросекунд)
+    def pack(self) -> list[Any]:
+        return [
+            self.id,
+            self.todo,
+            self.reminder_time.timestamp(),
+            int(self.done),
+            self.timezone,
+        ]
+
+    @classmethod
+    def unpack(cls, value: Sequence[Any]) -> "Todo":
+        todo_id, todo, reminder_ts, done, user_timezone = value
+        return cls(
+            id=todo_id,
+            todo=todo,
+            reminder_time=datetime.fromtimestamp(reminder_ts, tz=timezone.utc),
+            done=bool(done),
+            timezone=user_timezone,
         )
-        total_count = (await cursor.fetchone())[0]
 
-        return max(1, math.ceil(total_count / page_size))
 
+def pack_todos(todos: Sequence[Todo]) -> list[list[Any]]:
+    return [todo.pack() for todo in todos]
 
-async def get_all_todos(conn: AsyncConnection) -> list[tuple[Any, ...]] | None:
-    async with conn.cursor() as cursor:
-        data = await cursor.execute(
-            query="""
-                SELECT user_id, todo, reminder_time, done, timezone
-                FROM todos;
-                
-            """,
+
+def unpack_todos(value: Sequence[Sequence[Any]] | None) -> list[Todo]:
+    return [Todo.unpack(item) for item in value or ()]
+
+
+def todo_page_row(
+    cursor: AsyncCursor,
+) -> Callable[[Sequence[Any]], tuple[int, Todo | None]]:
+    # row factory для GET_TODO_PAGE: (total, Todo | None) без промежуточных
+    # кортежей; LEFT JOIN даёт одну строку с NULL, если напоминаний нет
+    def make_row(values: Sequence[Any]) -> tuple[int, Todo | None]:
+        if values[1] is None:
+            return values[0], None
+        return values[0], Todo(*values[1:])
+
+    return make_row
+
+
+@dataclass
+class TodoPage:
+    rows: list[Todo]
+    total: int
+    has_next: bool
+
+    @property
+    def total_pages(self) -> int:
+        return max(1, math.ceil(self.total / PAGE_SIZE))
+
+    @property
+    def first(self) -> TodoCursor | None:
+        return self.rows[0].cursor if self.rows else None
+
+    @property
+    def last(self) -> TodoCursor | None:
+        return self.rows[-1].cursor if self.rows else None
+
+
+_PAGE_SEEK = {
+    "first": ("TRUE", "reminder_time, id"),
+    "after": ("(reminder_time, id) > (%(time)s, %(id)s)", "reminder_time, id"),
+    "start": ("(reminder_time, id) >= (%(time)s, %(id)s)", "reminder_time, id"),
+    "before": (
+        "(reminder_time, id) < (%(time)s, %(id)s)",
+        "reminder_time DESC, id DESC",
+    ),
+}
+
+GET_TODO_PAGE = {
+    mode: queries.register(
+        f"get_todo_page_{mode}",
+        f"""
+            SELECT t.total, p.id, p.todo, p.reminder_time, p.done, p.timezone
+            FROM (SELECT COUNT(*) AS total FROM todos WHERE user_id = %(user_id)s) t
+            LEFT JOIN LATERAL (
+                SELECT id, todo, reminder_time, done, timezone
+                FROM todos
+                WHERE user_id = %(user_id)s AND {condition}
+                ORDER BY {order}
+                LIMIT %(limit)s
+            ) p ON TRUE;
+        """,
+    )
+    for mode, (condition, order) in _PAGE_SEEK.items()
+}
+
+
+async def get_todo_page(
+    conn: AsyncConnection,
+    *,
+    user_id: int,
+    after: TodoCursor | None = None,
+    before: TodoCursor | None = None,
+    start: TodoCursor | None = None,
+    page_size: int = PAGE_SIZE,
+) -> TodoPage:
+    # keyset-пагинация по (reminder_time, id): страница, признак следующей
+    # страницы (лишняя строка) и общее число напоминаний за один запрос
+    if after is not None:
+        mode, cursor_key = "after", after
+    elif before is not None:
+        mode, cursor_key = "before", before
+    elif start is not None:
+        mode, cursor_key = "start", start
+    else:
+        mode, cursor_key = "first", (None, None)
+    async with conn.cursor(row_factory=todo_page_row) as cursor:
+        data = await queries.execute(
+            cursor,
+            GET_TODO_PAGE[mode],
+            {
+                "user_id": user_id,
+                "time": cursor_key[0],
+                "id": cursor_key[1],
+                "limit": page_size + 1,
+            },
         )
-        row = await data.fetchall()
-    logger.info("Row is %s", row)
-    return row if row else None
+        fetched = await data.fetchall()
+    total = fetched[0][0]
+    rows = [todo for _, todo in fetched if todo is not None]
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if mode == "before":
+        # при движении назад лишняя строка означает предыдущую страницу,
+        # а следующая страница заведомо есть
+        rows.reverse()
+        return TodoPage(rows=rows, total=total, has_next=True)
+    return TodoPage(rows=rows, total=total, has_next=has_more)
 
 
 async def change_todo_status(
-    conn: AsyncConnection, *, boolean: bool, user_id: int, todo: str
-) -> None:
+    conn: AsyncConnection, *, boolean: bool, user_id: int, todo_id: int
+) -> list[int]:
+    # user_id в условии: чужое напоминание по подобранному id не изменится
     async with conn.cursor() as cursor:
-        data = await cursor.execute(
-            query="""
-                UPDATE todos
-                SET done = %s
-                WHERE user_id = %s AND todo = %s
-
-            """,
-            params=(boolean, user_id, todo),
+        data = await queries.execute(
+            cursor, CHANGE_TODO_STATUS, (boolean, todo_id, user_id)
         )
+        rows = await data.fetchall()
         rowcount = cursor.rowcount
         logger.info(f"{rowcount} while updating todos")
+    return [row[0] for row in rows]
 
 
-async def remove_todo(conn: AsyncConnection, *, user_id: int, todo: str) -> None:
+async def remove_todo(
+    conn: AsyncConnection, *, user_id: int, todo_id: int
+) -> list[int]:
     async with conn.cursor() as cursor:
-        data = await cursor.execute(
-            query="""
-                DELETE FROM todos
-                WHERE user_id = %s AND todo = %s
+        data = await queries.execute(cursor, REMOVE_TODO, (todo_id, user_id))
+        rows = await data.fetchall()
+        rowcount = cursor.rowcount
+        logger.info(f"{rowcount} while updating todos")
+    return [row[0] for row in rows]
+
 
-            """,
-            params=(user_id, todo),
+async def set_todos_status(
+    conn: AsyncConnection, *, done: bool, user_id: int, todo_ids: Sequence[int]
+) -> list[int]:
+    if not todo_ids:
+        return []
+    async with conn.cursor() as cursor:
+        data = await queries.execute(
+            cursor, SET_TODOS_STATUS, (done, user_id, list(todo_ids), done)
         )
+        rows = await data.fetchall()
+    logger.info(f"{len(rows)} todos marked done={done}")
+    return [row[0] for row in rows]
 
-        rowcount = cursor.rowcount
-        logger.info(f"{rowcount} while updating todos")
+
+async def remove_todos(
+    conn: AsyncConnection, *, user_id: int, todo_ids: Sequence[int]
+) -> list[int]:
+    if not todo_ids:
+        return []
+    async with conn.cursor() as cursor:
+        data = await queries.execute(cursor, REMOVE_TODOS, (user_id, list(todo_ids)))
+        rows = await data.fetchall()
+    logger.info(f"{len(rows)} todos removed")
+    return [row[0] for row in rows]
+
+
+async def complete_past_todos(conn: AsyncConnection, *, user_id: int) -> list[int]:
+    async with conn.cursor() as cursor:
+        data = await queries.execute(cursor, COMPLETE_PAST_TODOS, (user_id,))
+        rows = await data.fetchall()
+    logger.info(f"{len(rows)} past todos completed")
+    return [row[0] for row in rows]
+
+
+async def remove_done_todos(conn: AsyncConnection, *, user_id: int) -> list[int]:
+    async with conn.cursor() as cursor:
+        data = await queries.execute(cursor, REMOVE_DONE_TODOS, (user_id,))
+        rows = await data.fetchall()
+    logger.info(f"{len(rows)} done todos removed")
+    return [row[0] for row in rows]
+
+
+async def claim_due_todos(
+    conn: AsyncConnection,
+    *,
+    lookahead: timedelta,
+    lease: timedelta,
+    max_lateness: timedelta,
+    limit: int,
+    partitions: int = 1,
+    owned: Sequence[int] = (0,),
+) -> list[tuple[Any, ...]]:
+    # строки, захваченные другим воркером, пропускаются (SKIP LOCKED),
+    # а claimed_until не даёт забрать их повторно до истечения аренды
+    async with conn.cursor() as cursor:
+        data = await queries.execute(
+            cursor,
+            CLAIM_DUE_TODOS,
+            {
+                "lookahead": lookahead,
+                "lease": lease,
+                "max_lateness": max_lateness,
+                "limit": limit,
+                "partitions": partitions,
+                "owned": list(owned),
+            },
+        )
+        rows = await data.fetchall()
+    logger.debug("Claimed %d due todos", len(rows))
+    return rows
+
+
+async def release_partition_claims(
+    conn: AsyncConnection, *, partitions: int, lost: Sequence[int]
+) -> int:
+    # снимаем аренду строк отданных партиций, чтобы новый владелец
+    # не ждал её истечения
+    async with conn.cursor() as cursor:
+        await queries.execute(
+            cursor,
+            RELEASE_PARTITION_CLAIMS,
+            {"partitions": partitions, "lost": list(lost)},
+        )
+        return cursor.rowcount
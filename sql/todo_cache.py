@@ -0,0 +1,240 @@
+import json
+import logging
+import time
+from collections import OrderedDict
+from functools import partial
+from typing import Any
+
+from psycopg import AsyncConnection
+from redis.asyncio import Redis
+
+from config.config import CacheSettings
+from .connection import after_commit
+from .generations import UserGenerations
+from .todo_actions import (
+    PAGE_SIZE,
+    TodoCursor,
+    TodoPage,
+    add_todo,
+    change_todo_status,
+    complete_past_todos,
+    get_todo_page,
+    pack_todos,
+    remove_done_todos,
+    remove_todo,
+    remove_todos,
+    set_todos_status,
+    unpack_todos,
+)
+
+logger = logging.getLogger(__name__)
+
+PageKey = tuple[str, TodoCursor | None, int]
+
+
+# кэш страниц списка напоминаний по пользователям: в памяти процесса
+# (LRU по user_id с TTL) и опционально Redis-хэш на пользователя как второй
+# уровень; любая запись в todos пользователя после фиксации увеличивает его
+# поколение в Redis, и все воркеры перестают отдавать его старые страницы
+class TodoPageCache:
+    def __init__(self, maxsize: int = 10000, ttl: float = 60.0) -> None:
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._redis: Redis | None = None
+        self._generations = UserGenerations("todo_pages")
+        # user_id -> (поколение, страницы)
+        self._users: OrderedDict[
+            int, tuple[int, dict[PageKey, tuple[float, TodoPage]]]
+        ] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, settings: CacheSettings, redis: Redis | None = None) -> None:
+        self._maxsize = settings.todo_maxsize
+        self._ttl = settings.todo_ttl
+        self._redis = redis if settings.use_redis else None
+        self._generations.configure(redis)
+        self._users.clear()
+
+    async def get_page(
+        self,
+        conn: AsyncConnection,
+        *,
+        user_id: int,
+        after: TodoCursor | None = None,
+        before: TodoCursor | None = None,
+        start: TodoCursor | None = None,
+        page_size: int = PAGE_SIZE,
+    ) -> TodoPage:
+        if after is not None:
+            key = ("after", after, page_size)
+        elif before is not None:
+            key = ("before", before, page_size)
+        elif start is not None:
+            key = ("start", start, page_size)
+        else:
+            key = ("first", None, page_size)
+
+        generation = await self._generations.get(user_id)
+        cached = self._users.get(user_id)
+        if cached is not None and cached[0] == generation:
+            entry = cached[1].get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._users.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+
+        self.misses += 1
+        if generation is None:
+            # поколение неизвестно - читаем из БД мимо кэша
+            return await get_todo_page(
+                conn,
+                user_id=user_id,
+                after=after,
+                before=before,
+                start=start,
+                page_size=page_size,
+            )
+        # страницы пишем в тот же словарь, что был до загрузки: если за это
+        # время пользователя инвалидировали, результат просто не сохранится
+        if cached is None or cached[0] != generation:
+            cached = (generation, {})
+            self._users[user_id] = cached
+        pages = cached[1]
+        todo_page = await self._read_redis(user_id, generation, key)
+        from_db = todo_page is None
+        if from_db:
+            todo_page = await get_todo_page(
+                conn,
+                user_id=user_id,
+                after=after,
+                before=before,
+                start=start,
+                page_size=page_size,
+            )
+        if self._users.get(user_id) is cached:
+            pages[key] = (time.monotonic() + self._ttl, todo_page)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self._maxsize:
+                self._users.popitem(last=False)
+            if from_db:
+                await self._write_redis(user_id, generation, key, todo_page)
+        return todo_page
+
+    async def add_todo(self, conn: AsyncConnection, **kwargs: Any) -> int | None:
+        todo_id = await add_todo(conn, **kwargs)
+        await after_commit(conn, partial(self.invalidate, kwargs["user_id"]))
+        return todo_id
+
+    async def change_todo_status(
+        self, conn: AsyncConnection, *, boolean: bool, user_id: int, todo_id: int
+    ) -> list[int]:
+        todo_ids = await change_todo_status(
+            conn, boolean=boolean, user_id=user_id, todo_id=todo_id
+        )
+        await after_commit(conn, partial(self.invalidate, user_id))
+        return todo_ids
+
+    async def remove_todo(
+        self, conn: AsyncConnection, *, user_id: int, todo_id: int
+    ) -> list[int]:
+        todo_ids = await remove_todo(conn, user_id=user_id, todo_id=todo_id)
+        await after_commit(conn, partial(self.invalidate, user_id))
+        return todo_ids
+
+    async def set_todos_status(
+        self, conn: AsyncConnection, *, done: bool, user_id: int, todo_ids: list[int]
+    ) -> list[int]:
+        changed = await set_todos_status(
+            conn, done=done, user_id=user_id, todo_ids=todo_ids
+        )
+        if changed:
+            await after_commit(conn, partial(self.invalidate, user_id))
+        return changed
+
+    async def remove_todos(
+        self, conn: AsyncConnection, *, user_id: int, todo_ids: list[int]
+    ) -> list[int]:
+        removed = await remove_todos(conn, user_id=user_id, todo_ids=todo_ids)
+        if removed:
+            await after_commit(conn, partial(self.invalidate, user_id))
+        return removed
+
+    async def complete_past_todos(
+        self, conn: AsyncConnection, *, user_id: int
+    ) -> list[int]:
+        changed = await complete_past_todos(conn, user_id=user_id)
+        if changed:
+            await after_commit(conn, partial(self.invalidate, user_id))
+        return changed
+
+    async def remove_done_todos(
+        self, conn: AsyncConnection, *, user_id: int
+    ) -> list[int]:
+        removed = await remove_done_todos(conn, user_id=user_id)
+        if removed:
+            await after_commit(conn, partial(self.invalidate, user_id))
+        return removed
+
+    async def invalidate(self, user_id: int) -> None:
+        self._users.pop(user_id, None)
+        # хэш второго уровня со старым поколением больше не читается
+        # и истечёт сам
+        await self._generations.bump(user_id)
+
+    async def _read_redis(
+        self, user_id: int, generation: int, key: PageKey
+    ) -> TodoPage | None:
+        if self._redis is None:
+            return None
+        try:
+            raw = await self._redis.hget(
+                self._redis_key(user_id, generation), self._redis_field(key)
+            )
+        except Exception as e:
+            logger.warning(
+                "Failed to read todo page of user %d from Redis: %s", user_id, e
+            )
+            return None
+        return None if raw is None else self._decode(raw)
+
+    async def _write_redis(
+        self, user_id: int, generation: int, key: PageKey, todo_page: TodoPage
+    ) -> None:
+        if self._redis is None:
+            return
+        redis_key = self._redis_key(user_id, generation)
+        try:
+            async with self._redis.pipeline(transaction=True) as pipe:
+                pipe.hset(redis_key, self._redis_field(key), self._encode(todo_page))
+                pipe.expire(redis_key, int(self._ttl))
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(
+                "Failed to write todo page of user %d to Redis: %s", user_id, e
+            )
+
+    @staticmethod
+    def _redis_key(user_id: int, generation: int) -> str:
+        return f"todo_pages:v2:{user_id}:{generation}"
+
+    @staticmethod
+    def _redis_field(key: PageKey) -> str:
+        mode, cursor, page_size = key
+        if cursor is None:
+            return f"{mode}:{page_size}"
+        return f"{mode}:{page_size}:{cursor[0].isoformat()}:{cursor[1]}"
+
+    @staticmethod
+    def _encode(todo_page: TodoPage) -> str:
+        return json.dumps(
+            [todo_page.total, int(todo_page.has_next), pack_todos(todo_page.rows)]
+        )
+
+    @staticmethod
+    def _decode(raw: bytes | str) -> TodoPage:
+        total, has_next, rows = json.loads(raw)
+        return TodoPage(rows=unpack_todos(rows), total=total, has_next=bool(has_next))
+
+
+todo_page_cache = TodoPageCache()
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from functools import partial
+from datetime import datetime
+from typing import Any
+
+from psycopg import AsyncConnection
+from redis.asyncio import Redis
+
+from config.config import CacheSettings
+from timezones.timezones import DEFAULT_TIMEZONE
+from .actions import add_user, change_user_alive_status, get_user, set_user_timezone
+from .connection import after_commit
+from .generations import UserGenerations
+
+logger = logging.getLogger(__name__)
+
+# "пользователя нет в БД" тоже кэшируем, чтобы не ходить в БД повторно
+_MISSING = object()
+
+
+# read-through кэш профилей поверх sql/actions.py: LRU с TTL в памяти
+# процесса и (опционально) Redis как второй уровень; записи увеличивают
+# поколение пользователя в Redis, поэтому копии в других воркерах перестают
+# считаться актуальными сразу, а не по истечении TTL. Одновременные промахи
+# по одному user_id схлопываются в один запрос
+class UserCache:
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0) -> None:
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._redis: Redis | None = None
+        self._generations = UserGenerations("user_profile")
+        # user_id -> (истекает, поколение, строка)
+        self._entries: OrderedDict[int, tuple[float, int, Any]] = OrderedDict()
+        self._inflight: dict[tuple[int, int | None], asyncio.Future] = {}
+        # загрузки, инвалидированные по ходу: результат не кэшируем
+        self._stale: set[tuple[int, int | None]] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, settings: CacheSettings, redis: Redis | None = None) -> None:
+        self._maxsize = settings.user_maxsize
+        self._ttl = settings.user_ttl
+        self._redis = redis if settings.use_redis else None
+        # поколения нужны и без Redis-кэша: воркеров может быть несколько
+        self._generations.configure(redis)
+        self._entries.clear()
+
+    async def get_user(
+        self, conn: AsyncConnection, *, user_id: int
+    ) -> tuple[Any, ...] | None:
+        generation = await self._generations.get(user_id)
+        entry = self._entries.get(user_id)
+        if (
+            entry is not None
+            and generation is not None
+            and entry[1] == generation
+            and entry[0] > time.monotonic()
+        ):
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return None if entry[2] is _MISSING else entry[2]
+
+        key = (user_id, generation)
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.hits += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            row = await self._load(conn, user_id, generation)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # помечаем исключение полученным, его уже пробросит вызывающий
+            future.exception()
+            raise
+        else:
+            future.set_result(row)
+            if generation is not None and key not in self._stale:
+                self._store(user_id, generation, row)
+            return row
+        finally:
+            del self._inflight[key]
+            self._stale.discard(key)
+
+    async def add_user(self, conn: AsyncConnection, **kwargs: Any) -> None:
+        await add_user(conn, **kwargs)
+        await after_commit(conn, partial(self.invalidate, kwargs["user_id"]))
+
+    async def change_user_alive_status(
+        self, conn: AsyncConnection, *, is_alive: bool, user_id: int
+    ) -> None:
+        await change_user_alive_status(conn, is_alive=is_alive, user_id=user_id)
+        await after_commit(conn, partial(self.invalidate, user_id))
+
+    async def set_user_timezone(
+        self, conn: AsyncConnection, *, user_id: int, user_timezone: str
+    ) -> bool:
+        updated = await set_user_timezone(
+            conn, user_id=user_id, user_timezone=user_timezone
+        )
+        await after_commit(conn, partial(self.invalidate, user_id))
+        return updated
+
+    async def get_user_timezone(self, conn: AsyncConnection, *, user_id: int) -> str:
+        row = await self.get_user(conn, user_id=user_id)
+        return (row[7] if row else None) or DEFAULT_TIMEZONE
+
+    async def invalidate(self, user_id: int) -> None:
+        self._entries.pop(user_id, None)
+        self._stale.update(key for key in self._inflight if key[0] == user_id)
+        # запись второго уровня со старым поколением больше не читается
+        # и истечёт сама
+        await self._generations.bump(user_id)
+
+    async def _load(
+        self, conn: AsyncConnection, user_id: int, generation: int | None
+    ) -> tuple[Any, ...] | None:
+        redis = self._redis if generation is not None else None
+        if redis is not None:
+            try:
+                raw = await redis.get(self._redis_key(user_id, generation))
+            except Exception as e:
+                logger.warning("Failed to read user %d from Redis: %s", user_id, e)
+                raw = None
+            if raw is not None:
+                return self._decode(raw)
+
+        row = await get_user(conn, user_id=user_id)
+        # ключ инвалидирован во время загрузки: строка могла устареть
+        if (
+            redis is not None
+            and row is not None
+            and (user_id, generation) not in self._stale
+        ):
+            try:
+                await redis.set(
+                    self._redis_key(user_id, generation),
+                    self._encode(row),
+                    ex=int(self._ttl),
+                )
+            except Exception as e:
+                logger.warning("Failed to write user %d to Redis: %s", user_id, e)
+        return row
+
+    def _store(
+        self, user_id: int, generation: int, row: tuple[Any, ...] | None
+    ) -> None:
+        value = _MISSING if row is None else row
+        self._entries[user_id] = (time.monotonic() + self._ttl, generation, value)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self._maxsize:
+            self._entries.popitem(last=False)
+
+    @staticmethod
+    def _redis_key(user_id: int, generation: int) -> str:
+        return f"user_profile:v3:{user_id}:{generation}"
+
+    @staticmethod
+    def _encode(row: tuple[Any, ...]) -> str:
+        *head, created_at, user_timezone = row
+        return json.dumps([*head, created_at.isoformat(), user_timezone])
+
+    @staticmethod
+    def _decode(raw: bytes | str) -> tuple[Any, ...]:
+        *head, created_at, user_timezone = json.loads(raw)
+        return (*head, datetime.fromisoformat(created_at), user_timezone)
+
+
+user_cache = UserCache()
@@ -0,0 +1,33 @@
+import importlib
+
+import pytest
+
+# модули читают конфиг при импорте
+ENV = {
+    "BOT_TOKEN": "123456:TEST",
+    "ADMIN_ID": "1",
+    "POSTGRES_DB": "test",
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_PORT": "5432",
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "REDIS_HOST": "localhost",
+    "REDIS_PORT": "6379",
+    "REDIS_DATABASE": "0",
+    "LOG_LEVEL": "INFO",
+    "LOG_FORMAT": "%(message)s",
+}
+
+# точки входа тянут за собой все модули бота
+ENTRY_POINTS = ["main", "polling.polling", "sql.migrations"]
+
+
+# смоук-тест против закреплённых версий из requirements.txt: ловит импорты
+# имён, которых в установленных библиотеках нет
+@pytest.mark.parametrize("module", ENTRY_POINTS)
+def test_entry_point_imports(module, monkeypatch):
+    pytest.importorskip("aiogram")
+    pytest.importorskip("environs")
+    for name, value in ENV.items():
+        monkeypatch.setenv(name, value)
+    importlib.import_module(module)
@@ -0,0 +1,67 @@
+import bisect
+import difflib
+import logging
+from functools import lru_cache
+from typing import Iterable
+from zoneinfo import ZoneInfo, available_timezones
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEZONE = "Europe/Moscow"
+
+
+# ZoneInfo и так кэширует объекты, но каждый вызов конструктора всё равно
+# проходит через нормализацию ключа и блокировку кэша; здесь - просто dict lookup
+@lru_cache(maxsize=None)
+def get_zone(name: str | None) -> ZoneInfo:
+    return ZoneInfo(name or DEFAULT_TIMEZONE)
+
+
+def _normalize(name: str) -> str:
+    return name.strip().lower().replace(" ", "_")
+
+
+# индекс часовых поясов: регион -> {название города в нижнем регистре:
+# полное имя зоны}; строится один раз, дальше только dict lookup
+class TimezoneIndex:
+    def __init__(self, zones: Iterable[str]) -> None:
+        self._regions: dict[str, dict[str, str]] = {}
+        # сначала короткие имена, чтобы "Indianapolis" означал America/Indianapolis,
+        # а не America/Indiana/Indianapolis
+        for zone in sorted(zones, key=lambda z: (z.count("/"), z)):
+            region, sep, rest = zone.partition("/")
+            if not sep:
+                continue
+            cities = self._regions.setdefault(region.lower(), {})
+            cities.setdefault(rest.lower(), zone)
+            cities.setdefault(rest.rsplit("/", 1)[-1].lower(), zone)
+        self._names = {
+            region: sorted(cities) for region, cities in self._regions.items()
+        }
+
+    def resolve(self, region: str, city: str) -> str | None:
+        return self._regions.get(region.lower(), {}).get(_normalize(city))
+
+    def suggest(self, region: str, city: str, limit: int = 5) -> list[str]:
+        cities = self._regions.get(region.lower())
+        if not cities:
+            return []
+        key = _normalize(city)
+        names = self._names[region.lower()]
+        start = bisect.bisect_left(names, key)
+        matches = []
+        for name in names[start:]:
+            if not name.startswith(key) or len(matches) >= limit:
+                break
+            matches.append(name)
+        if not matches:
+            matches = difflib.get_close_matches(key, names, n=limit, cutoff=0.6)
+        zones = dict.fromkeys(cities[name] for name in matches)
+        return list(zones)[:limit]
+
+
+@lru_cache(maxsize=1)
+def get_timezone_index() -> TimezoneIndex:
+    index = TimezoneIndex(available_timezones())
+    logger.info("Timezone index built")
+    return index
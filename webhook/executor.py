@@ -0,0 +1,67 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[Any]]
+
+
+# задачи с одним ключом (chat_id) выполняются строго по очереди,
+# с разными ключами - параллельно, но не больше concurrency одновременно;
+# опустевшая "полоса" сразу удаляется вместе со своей корутиной
+class KeyedExecutor:
+    def __init__(self, concurrency: int) -> None:
+        self._slots = asyncio.Semaphore(concurrency)
+        self._lanes: dict[Hashable, deque[Job]] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def lanes(self) -> int:
+        return len(self._lanes)
+
+    def submit(self, key: Hashable, job: Job) -> None:
+        self._pending += 1
+        self._idle.clear()
+        lane = self._lanes.get(key)
+        if lane is not None:
+            lane.append(job)
+            return
+        self._lanes[key] = deque((job,))
+        task = asyncio.create_task(self._drain(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def join(self) -> None:
+        await self._idle.wait()
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._lanes.clear()
+        self._pending = 0
+        self._idle.set()
+
+    async def _drain(self, key: Hashable) -> None:
+        lane = self._lanes[key]
+        while lane:
+            job = lane.popleft()
+            try:
+                async with self._slots:
+                    await job()
+            except Exception as e:
+                logger.exception("Job for %s failed: %s", key, e)
+            finally:
+                self._pending -= 1
+                if not self._pending:
+                    self._idle.set()
+        del self._lanes[key]
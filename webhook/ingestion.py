@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiogram.types.update import UpdateTypeLookupError
+
+from config.config import WebhookSettings
+from webhook.executor import KeyedExecutor
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class IngestionStats:
+    accepted: int = 0
+    rejected: int = 0
+    processed: int = 0
+    failed: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+    handle_total: float = 0.0
+    handle_max: float = 0.0
+
+
+def update_chat_key(update: Update) -> int | str:
+    try:
+        event = update.event
+    except UpdateTypeLookupError:
+        # тип апдейта неизвестен этой версии aiogram: обработает
+        # feed_update, а здесь упорядочивать не по чему
+        return f"update:{update.update_id}"
+    chat = getattr(event, "chat", None)
+    if chat is None and update.callback_query and update.callback_query.message:
+        chat = update.callback_query.message.chat
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None)
+    if user is not None:
+        return user.id
+    # апдейты без чата и пользователя ни с чем не упорядочиваем
+    return f"update:{update.update_id}"
+
+
+# вебхук только кладёт апдейт в ограниченную очередь и сразу отвечает
+# Telegram; апдейты одного чата обрабатываются по порядку, разных чатов -
+# параллельно пулом из settings.workers слотов
+class UpdateIngestion:
+    def __init__(self, bot: Bot, dp: Dispatcher, settings: WebhookSettings) -> None:
+        self._bot = bot
+        self._dp = dp
+        self._workers_count = settings.workers
+        self._queue_size = settings.queue_size
+        self._drain_timeout = settings.drain_timeout
+        self._executor: KeyedExecutor | None = None
+        self.stats = IngestionStats()
+
+    def start(self) -> None:
+        if self._executor is not None:
+            return
+        self._executor = KeyedExecutor(concurrency=self._workers_count)
+        logger.info(
+            "Update ingestion started: %d workers, queue size %d",
+            self._workers_count,
+            self._queue_size,
+        )
+
+    async def stop(self) -> None:
+        if self._executor is None:
+            return
+        try:
+            await asyncio.wait_for(self._executor.join(), timeout=self._drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Update queue not drained, %d updates dropped", self._executor.pending
+            )
+        await self._executor.close()
+        self._executor = None
+        logger.info("Update ingestion stopped")
+
+    def submit(self, update: Update) -> bool:
+        if self._executor is None or self._executor.pending >= self._queue_size:
+            self.stats.rejected += 1
+            logger.warning("Update queue is full, update %d rejected", update.update_id)
+            return False
+        enqueued_at = time.monotonic()
+        self._executor.submit(
+            update_chat_key(update), lambda: self._process(update, enqueued_at)
+        )
+        self.stats.accepted += 1
+        return True
+
+    def metrics(self) -> dict[str, float | int]:
+        stats = self.stats
+        done = stats.processed + stats.failed
+        executor = self._executor
+        return {
+            "queue_depth": executor.pending if executor else 0,
+            "queue_size": self._queue_size,
+            "lanes": executor.lanes if executor else 0,
+            "workers": self._workers_count,
+            "accepted": stats.accepted,
+            "rejected": stats.rejected,
+            "processed": stats.processed,
+            "failed": stats.failed,
+            "wait_avg": stats.wait_total / done if done else 0.0,
+            "wait_max": stats.wait_max,
+            "handle_avg": stats.handle_total / done if done else 0.0,
+            "handle_max": stats.handle_max,
+        }
+
+    async def _process(self, update: Update, enqueued_at: float) -> None:
+        started_at = time.monotonic()
+        try:
+            await self._dp.feed_update(self._bot, update)
+            self.stats.processed += 1
+        except Exception as e:
+            self.stats.failed += 1
+            logger.exception("Failed to process update %d: %s", update.update_id, e)
+        finally:
+            finished_at = time.monotonic()
+            self._observe(started_at - enqueued_at, finished_at - started_at)
+
+    def _observe(self, wait: float, handle: float) -> None:
+        stats = self.stats
+        stats.wait_total += wait
+        stats.wait_max = max(stats.wait_max, wait)
+        stats.handle_total += handle
+        stats.handle_max = max(stats.handle_max, handle)
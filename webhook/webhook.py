@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Request, FastAPI
+from fastapi import APIRouter, Request, FastAPI, HTTPException
 from aiogram.types import Update
 from contextlib import asynccontextmanager
 import os
 from aiogram import Bot, Dispatcher
+from webhook.ingestion import UpdateIngestion
+from sql.queries import queries
+from bot.storage import BufferedRedisStorage
+from sender.sender import OutboundSender
 
 router = APIRouter()
 
@@ -11,6 +15,32 @@ router = APIRouter()
 async def telegram_webhook(request: Request):
     bot: Bot = request.app.state.bot
     dp: Dispatcher = request.app.state.dp
+    ingestion: UpdateIngestion | None = request.app.state.ingestion
     update = Update.model_validate(await request.json())
-    await dp.feed_update(bot, update)
+    if ingestion is None:
+        await dp.feed_update(bot, update)
+        return {"ok": True}
+    # очередь переполнена: Telegram повторит доставку позже
+    if not ingestion.submit(update):
+        raise HTTPException(status_code=503, detail="Update queue is full")
     return {"ok": True}
+
+
+@router.get("/metrics")
+async def ingestion_metrics(request: Request):
+    ingestion: UpdateIngestion | None = request.app.state.ingestion
+    if ingestion is None:
+        updates = {"mode": "sync"}
+    else:
+        updates = {"mode": "queue", **ingestion.metrics()}
+    metrics = {
+        "updates": updates,
+        "queries": queries.stats(),
+        "reminders": request.app.state.membership.metrics(),
+    }
+    sender: OutboundSender = request.app.state.sender
+    metrics["sender"] = sender.metrics()
+    storage = request.app.state.storage
+    if isinstance(storage, BufferedRedisStorage):
+        metrics["fsm"] = storage.metrics()
+    return metrics